@@ -0,0 +1,227 @@
+import os
+import json
+import numpy as np
+
+
+# === K-Means ===
+def _squared_distances(x, centroids):
+    return (
+        (x * x).sum(1, keepdims=True)
+        - 2 * x @ centroids.T
+        + (centroids * centroids).sum(1)
+    )
+
+
+def kmeans(x, k, iterations=20, seed=0):
+    # Plain Lloyd's iterations from a random sample; empty clusters are re-seeded from
+    # the points farthest from their centroid
+    rng = np.random.default_rng(seed)
+    k = min(k, len(x))
+    centroids = x[rng.choice(len(x), k, replace=False)].copy()
+    for _ in range(iterations):
+        distances = _squared_distances(x, centroids)
+        assign = distances.argmin(1)
+        counts = np.bincount(assign, minlength=k)
+        empty = counts == 0
+        # Per-cluster sums by sorting points by cluster (np.add.at is far slower)
+        order = np.argsort(assign, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        sums = np.add.reduceat(x[order], starts[~empty], axis=0)
+        centroids[~empty] = sums / counts[~empty, None]
+        if empty.any():
+            farthest = np.argsort(-distances[np.arange(len(x)), assign])[:empty.sum()]
+            centroids[empty] = x[farthest]
+    return centroids.astype(np.float32)
+
+
+# === IVF-PQ ===
+class IVFPQIndex:
+    # Inverted file over `nlist` coarse k-means cells; each vector is stored as the
+    # product-quantized code (m bytes) of its residual from the cell centroid.
+    # Recall/latency knobs at query time: nprobe (cells scanned per query) and rerank
+    # (candidates re-scored exactly against the full vectors, when available).
+    # Vectors are expected L2-normalized, so L2 order equals cosine order.
+
+    def __init__(self, dim, nlist=256, m=16, nprobe=8, rerank=0):
+        if dim % m:
+            raise ValueError(f"dim {dim} must be divisible by m {m}")
+        self.dim = dim
+        self.nlist = nlist
+        self.m = m
+        self.dsub = dim // m
+        self.nprobe = nprobe
+        self.rerank = rerank
+        self.coarse = None     # (nlist, dim)
+        self.codebooks = None  # (m, ksub, dsub)
+        self.list_ids = []     # per cell: int64 ids
+        self.list_codes = []   # per cell: (n, m) uint8 codes
+        self.deleted = set()
+
+    @property
+    def is_trained(self):
+        return self.coarse is not None
+
+    def __len__(self):
+        return sum(len(ids) for ids in self.list_ids) - len(self.deleted)
+
+    # === Training ===
+    def train(self, vectors, iterations=20, max_train=32768, seed=0):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        rng = np.random.default_rng(seed)
+        if len(vectors) > max_train:
+            vectors = vectors[rng.choice(len(vectors), max_train, replace=False)]
+        self.coarse = kmeans(vectors, self.nlist, iterations, seed)
+        self.nlist = len(self.coarse)
+        residuals = vectors - self.coarse[self._assign(vectors)]
+        ksub = min(256, len(vectors))
+        self.codebooks = np.stack([
+            kmeans(residuals[:, j * self.dsub:(j + 1) * self.dsub], ksub, iterations, seed + j)
+            for j in range(self.m)
+        ])
+        self.list_ids = [np.zeros(0, dtype=np.int64) for _ in range(self.nlist)]
+        self.list_codes = [np.zeros((0, self.m), dtype=np.uint8) for _ in range(self.nlist)]
+        self.deleted = set()
+        self._precompute()
+
+    def _precompute(self):
+        # ||q - c - y||^2 = ||q - c||^2 + (||y||^2 + 2 c.y) - 2 q.y for cell centroid c and
+        # codeword y: the middle term depends only on (cell, codeword) and is tabled once,
+        # so a query needs one (m, ksub) table of q.y instead of one table per probed cell.
+        coarse = self.coarse.reshape(self.nlist, self.m, self.dsub)
+        self._cell_terms = (
+            (self.codebooks ** 2).sum(2)[None]
+            + 2 * np.einsum("lmd,mkd->lmk", coarse, self.codebooks)
+        ).astype(np.float32)
+
+    def _assign(self, vectors, batch=4096):
+        return np.concatenate([
+            _squared_distances(vectors[i:i + batch], self.coarse).argmin(1)
+            for i in range(0, len(vectors), batch)
+        ]) if len(vectors) else np.zeros(0, dtype=np.int64)
+
+    def _encode(self, residuals):
+        codes = np.empty((len(residuals), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            sub = residuals[:, j * self.dsub:(j + 1) * self.dsub]
+            codes[:, j] = _squared_distances(sub, self.codebooks[j]).argmin(1)
+        return codes
+
+    # === Updates ===
+    def add(self, ids, vectors):
+        if not self.is_trained:
+            raise RuntimeError("IVFPQIndex.add() called before train()")
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        cells = self._assign(vectors)
+        codes = self._encode(vectors - self.coarse[cells])
+        self.deleted.difference_update(ids.tolist())
+        for cell in np.unique(cells):
+            members = cells == cell
+            self.list_ids[cell] = np.concatenate([self.list_ids[cell], ids[members]])
+            self.list_codes[cell] = np.concatenate([self.list_codes[cell], codes[members]])
+
+    def remove(self, ids):
+        # Tombstones; dropped from the cell lists on the next compact()/save()
+        self.deleted.update(int(i) for i in ids)
+
+    def compact(self):
+        if not self.deleted:
+            return
+        deleted = np.fromiter(self.deleted, dtype=np.int64)
+        for cell in range(self.nlist):
+            keep = ~np.isin(self.list_ids[cell], deleted)
+            if not keep.all():
+                self.list_ids[cell] = self.list_ids[cell][keep]
+                self.list_codes[cell] = self.list_codes[cell][keep]
+        self.deleted = set()
+
+    # === Search ===
+    def search(self, queries, k=5, nprobe=None, rerank=None, allowed=None, vectors=None):
+        # Returns (ids, scores) of shape (b, k), padded with -1 / -inf. `allowed` is an
+        # optional boolean mask indexed by id; `vectors` (indexable by id) enables rerank.
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        rerank = self.rerank if rerank is None else rerank
+        deleted = np.fromiter(self.deleted, dtype=np.int64) if self.deleted else None
+        shortlist = max(k, rerank * k) if vectors is not None and rerank else k
+        subspaces = np.arange(self.m)
+
+        out_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        out_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        coarse_distances = _squared_distances(queries, self.coarse)
+        probes = np.argpartition(coarse_distances, nprobe - 1, axis=1)[:, :nprobe]
+        query_terms = -2 * np.einsum("bmd,mkd->bmk", queries.reshape(len(queries), self.m, self.dsub), self.codebooks)
+
+        for qi, query in enumerate(queries):
+            cells = [cell for cell in probes[qi] if len(self.list_ids[cell])]
+            if not cells:
+                continue
+            ids = np.concatenate([self.list_ids[cell] for cell in cells])
+            codes = np.concatenate([self.list_codes[cell] for cell in cells])
+            cell_of = np.repeat(cells, [len(self.list_ids[cell]) for cell in cells])
+            keep = None
+            if allowed is not None:
+                keep = allowed[ids]
+            if deleted is not None:
+                alive = ~np.isin(ids, deleted)
+                keep = alive if keep is None else keep & alive
+            if keep is not None:
+                ids, codes, cell_of = ids[keep], codes[keep], cell_of[keep]
+                if not len(ids):
+                    continue
+
+            distances = (
+                coarse_distances[qi, cell_of]
+                + self._cell_terms[cell_of[:, None], subspaces, codes].sum(1)
+                + query_terms[qi][subspaces, codes].sum(1)
+            )
+            take = min(shortlist, len(ids))
+            top = np.argpartition(distances, take - 1)[:take]
+            ids = ids[top]
+            if shortlist > k:
+                ids = np.sort(ids)
+                scores = np.asarray(vectors[ids], dtype=np.float32) @ query
+            else:
+                scores = 1 - distances[top] / 2  # cosine from squared L2 of unit vectors
+            order = np.argsort(-scores)[:k]
+            out_ids[qi, :len(order)] = ids[order]
+            out_scores[qi, :len(order)] = scores[order]
+        return out_ids, out_scores
+
+    # === Persistence ===
+    def save(self, path):
+        # Cells are stored back to back (CSR layout) so load() is a few np.load calls
+        # Arrays are written to temp files and swapped in, so a loaded (memory-mapped)
+        # copy of the same index keeps reading its old files safely.
+        self.compact()
+        os.makedirs(path, exist_ok=True)
+        sizes = np.array([len(ids) for ids in self.list_ids], dtype=np.int64)
+        arrays = {
+            "coarse": self.coarse,
+            "codebooks": self.codebooks,
+            "list_offsets": np.concatenate([[0], np.cumsum(sizes)]),
+            "list_ids": np.concatenate(self.list_ids),
+            "list_codes": np.concatenate(self.list_codes),
+        }
+        for name, array in arrays.items():
+            tmp_path = os.path.join(path, f"{name}.tmp.npy")
+            np.save(tmp_path, array)
+            os.replace(tmp_path, os.path.join(path, f"{name}.npy"))
+        with open(os.path.join(path, "config.json"), "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "nlist": self.nlist, "m": self.m,
+                       "nprobe": self.nprobe, "rerank": self.rerank}, f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        # Cell arrays are memory-mapped views; a cell is copied only when add() grows it
+        with open(os.path.join(path, "config.json"), "r", encoding="utf-8") as f:
+            index = cls(**json.load(f))
+        index.coarse = np.load(os.path.join(path, "coarse.npy"))
+        index.codebooks = np.load(os.path.join(path, "codebooks.npy"))
+        offsets = np.load(os.path.join(path, "list_offsets.npy"))
+        ids = np.load(os.path.join(path, "list_ids.npy"), mmap_mode="r")
+        codes = np.load(os.path.join(path, "list_codes.npy"), mmap_mode="r")
+        index.list_ids = [ids[offsets[c]:offsets[c + 1]] for c in range(index.nlist)]
+        index.list_codes = [codes[offsets[c]:offsets[c + 1]] for c in range(index.nlist)]
+        index._precompute()
+        return index
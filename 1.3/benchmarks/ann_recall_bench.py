@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ann_index import IVFPQIndex
+from vector_pipeline import VectorIndex
+
+# === ARG PARSING ===
+parser = argparse.ArgumentParser(description="Recall vs latency of the IVF-PQ index against exact search")
+parser.add_argument("--index_dir", default=None, help="Benchmark a built VectorIndex instead of synthetic vectors")
+parser.add_argument("--rows", type=int, default=50000, help="Synthetic corpus size")
+parser.add_argument("--dim", type=int, default=512)
+parser.add_argument("--clusters", type=int, default=2000, help="Synthetic topics (records per topic ~ rows/clusters)")
+parser.add_argument("--noise", type=float, default=1.2, help="Spread around each topic (higher = harder)")
+parser.add_argument("--queries", type=int, default=200)
+parser.add_argument("-k", type=int, default=10)
+parser.add_argument("--nlist", type=int, default=None)
+parser.add_argument("--m", type=int, default=16)
+parser.add_argument("--seed", type=int, default=7)
+args = parser.parse_args()
+
+
+# === Corpus ===
+def normalize(x):
+    return (x / np.linalg.norm(x, axis=1, keepdims=True)).astype(np.float32)
+
+
+def synthetic_corpus(rng):
+    # Unit vectors scattered around topic centres, like many clients' records on the same fields
+    centres = rng.standard_normal((args.clusters, args.dim))
+    topics = rng.integers(0, args.clusters, args.rows)
+    vectors = normalize(centres[topics] + args.noise * rng.standard_normal((args.rows, args.dim)))
+    queries = normalize(centres[rng.integers(0, args.clusters, args.queries)]
+                        + args.noise * rng.standard_normal((args.queries, args.dim)))
+    return vectors, queries
+
+
+def exact_top_k(vectors, queries, k):
+    # Same method as VectorIndex.search_vectors: one product, then argpartition
+    scores = queries @ vectors.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1), axis=1)
+
+
+def per_query_ms(fn, queries):
+    start = time.perf_counter()
+    for q in queries:
+        fn(q[None, :])
+    return (time.perf_counter() - start) * 1000 / len(queries)
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(args.seed)
+    if args.index_dir:
+        index = VectorIndex(args.index_dir)
+        vectors = np.asarray(index.matrix)
+        queries = vectors[rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)]
+    else:
+        vectors, queries = synthetic_corpus(rng)
+    print(f"📚 {len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, k={args.k}")
+
+    truth = exact_top_k(vectors, queries, args.k)
+    exact_ms = per_query_ms(lambda q: exact_top_k(vectors, q, args.k), queries)
+
+    nlist = args.nlist or max(1, int(4 * np.sqrt(len(vectors))))
+    ann = IVFPQIndex(vectors.shape[1], nlist=nlist, m=args.m)
+    start = time.perf_counter()
+    ann.train(vectors)
+    ann.add(np.arange(len(vectors)), vectors)
+    print(f"🏗️ IVF-PQ: {ann.nlist} cells, {args.m} bytes/vector, built in {time.perf_counter() - start:.1f}s")
+    print(f"⚖️ exact search: {exact_ms:.2f} ms/query (recall 100%)\n")
+
+    print(f"  {'nprobe':>6} {'rerank':>6} {'recall@k':>9} {'ms/query':>9} {'speedup':>8}")
+    for rerank in (0, 4, 16):
+        for nprobe in (1, 2, 4, 8, 16, 32, 64):
+            if nprobe > ann.nlist:
+                break
+            ids, _ = ann.search(queries, args.k, nprobe=nprobe, rerank=rerank, vectors=vectors)
+            recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(ids, truth)])
+            ms = per_query_ms(lambda q: ann.search(q, args.k, nprobe=nprobe, rerank=rerank, vectors=vectors), queries)
+            print(f"  {nprobe:>6} {rerank:>6} {recall:>9.1%} {ms:>9.2f} {exact_ms / ms:>7.1f}x")
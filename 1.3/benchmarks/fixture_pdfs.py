@@ -0,0 +1,98 @@
+import os
+import sys
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from page_splitter import iter_page_blocks
+from page_triage import page_body
+
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+LINES_PER_PAGE = 60
+CHARS_PER_LINE = 95
+
+
+# === Minimal PDF Writer ===
+def _escape(line):
+    # Helvetica with WinAnsi covers Latin-1; anything else becomes "?"
+    line = line.encode("latin-1", errors="replace").decode("latin-1")
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path, pages):
+    # pages: list of pages, each a list of text lines. Writes a plain PDF 1.4 with one
+    # Helvetica text block per page, enough for pdfminer to read the text back.
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page objects are numbered
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    page_ids = []
+    for lines in pages:
+        text = "".join(f"({_escape(line)}) Tj T*\n" for line in lines)
+        stream = f"BT /F1 10 Tf 12 TL 40 800 Td\n{text}ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Resources << /Font << /F1 3 0 R >> >> "
+            b"/Contents %d 0 R >>" % len(objects)
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{i} 0 R" for i in page_ids).encode("ascii")
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(page_ids)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+# === Fixture Sets ===
+def page_lines(text):
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        while len(line) > CHARS_PER_LINE:
+            lines.append(line[:CHARS_PER_LINE])
+            line = line[CHARS_PER_LINE:]
+        if line:
+            lines.append(line)
+    return lines[:LINES_PER_PAGE]
+
+
+def generate_fixture_set(out_dir, documents=3, pages_per_document=12, source=None, seed=7):
+    # Writes fixture_<n>.pdf files whose pages reuse recorded page text (embedded text only),
+    # so extraction, triage and routing see realistic content offline. Returns the paths.
+    source = source or os.path.join(REPO, "OutputData", "final_output.txt")
+    bodies = []
+    for block in iter_page_blocks(source):
+        body = page_body(block.text.split("--- OCR TEXT ---")[0])
+        bodies.append(page_lines(body))
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for n in range(1, documents + 1):
+        pages = [list(rng.choice(bodies)) for _ in range(pages_per_document)]
+        path = os.path.join(out_dir, f"fixture_{n}.pdf")
+        write_pdf(path, pages)
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate fixture PDFs from recorded page text for offline tests")
+    parser.add_argument("--out_dir", required=True)
+    parser.add_argument("--documents", type=int, default=3)
+    parser.add_argument("--pages", type=int, default=12, help="Pages per document")
+    parser.add_argument("--source", default=None, help="Page-marker text to take page content from")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    paths = generate_fixture_set(args.out_dir, args.documents, args.pages, args.source, args.seed)
+    print(f"✅ {len(paths)} fixture PDFs x {args.pages} pages → {args.out_dir}")
@@ -0,0 +1,105 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from checkpoint import iter_live_records
+from json_repair import extract_json
+
+# === ARG PARSING ===
+parser = argparse.ArgumentParser(description="Microbenchmark for model-response JSON extraction")
+parser.add_argument("--live_output", default=os.path.join(os.path.dirname(__file__), "..", "..", "OutputData", "live_client_info.jsonl"))
+parser.add_argument("--write_corpus", default=None, help="Optionally save the generated corpus as JSONL")
+parser.add_argument("--repeat", type=int, default=20)
+parser.add_argument("--seed", type=int, default=7)
+args = parser.parse_args()
+
+
+# === Baseline (the regex extractor this replaced) ===
+def legacy_extract_first_json(response_text):
+    try:
+        match = re.search(r'\{.*\}', response_text, re.DOTALL)
+        if match:
+            return json.loads(match.group(0))
+    except Exception:
+        pass
+    return None
+
+
+# === Corpus ===
+def add_trailing_commas(text):
+    return re.sub(r'(null|"|\d|\]|\})(\s*\n\s*[\}\]])', r"\1,\2", text)
+
+
+def build_corpus(contents, rng):
+    # Each case: (variant, response text, expected object or None when only a prefix is recoverable)
+    corpus = []
+    for content in contents:
+        pretty = json.dumps(content, indent=2, ensure_ascii=False)
+        compact = json.dumps(content, ensure_ascii=False)
+        cut = rng.randint(len(pretty) // 3, len(pretty) - 5)
+
+        corpus += [
+            ("clean", pretty, content),
+            ("compact", compact, content),
+            ("fenced", f"Here is the extracted data:\n```json\n{pretty}\n```", content),
+            ("trailing_prose_brace", f"{pretty}\n\nNote: fields marked {{null}} were not found.", content),
+            ("leading_prose_brace", f"The {{template}} was filled as follows:\n{pretty}", content),
+            ("trailing_commas", add_trailing_commas(pretty), content),
+            ("truncated", pretty[:cut], None),
+            ("fenced_truncated", f"```json\n{pretty[:cut]}", None),
+        ]
+    return corpus
+
+
+def load_contents(path):
+    return [r["content"] for r, _, _ in iter_live_records(path) if isinstance(r.get("content"), dict) and "error" not in r["content"]]
+
+
+# === Benchmark ===
+def run(corpus, extractor, repeat):
+    recovered = defaultdict(int)
+    exact = defaultdict(int)
+    totals = defaultdict(int)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for variant, text, expected in corpus:
+            value = extractor(text)
+            if isinstance(value, tuple):
+                value = value[0]
+            totals[variant] += 1
+            if isinstance(value, dict):
+                recovered[variant] += 1
+                exact[variant] += expected is not None and value == expected
+    elapsed = time.perf_counter() - start
+    return recovered, exact, totals, elapsed / (repeat * len(corpus))
+
+
+if __name__ == "__main__":
+    contents = load_contents(args.live_output)
+    if not contents:
+        raise SystemExit(f"❌ No successful records found in {args.live_output}")
+    corpus = build_corpus(contents, random.Random(args.seed))
+
+    if args.write_corpus:
+        with open(args.write_corpus, "w", encoding="utf-8") as f:
+            for variant, text, expected in corpus:
+                f.write(json.dumps({"variant": variant, "response": text, "expected": expected}, ensure_ascii=False) + "\n")
+        print(f"💾 Corpus written to {args.write_corpus}")
+
+    print(f"📚 {len(corpus)} responses built from {len(contents)} records\n")
+    for name, extractor in [("legacy regex", legacy_extract_first_json), ("json_repair", extract_json)]:
+        recovered, exact, totals, per_call = run(corpus, extractor, args.repeat)
+        print(f"=== {name}: {per_call * 1e6:.1f} µs/response ===")
+        for variant in totals:
+            line = f"  {variant:<22} recovered {recovered[variant] / totals[variant]:6.1%}"
+            if variant not in ("truncated", "fenced_truncated"):
+                line += f"   exact {exact[variant] / totals[variant]:6.1%}"
+            print(line)
+        print()
@@ -0,0 +1,327 @@
+import os
+import re
+import sys
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import threading
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from checkpoint import iter_live_records, is_completed
+
+OUTPUT_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "OutputData")
+DEFAULT_STATS = os.path.join(OUTPUT_DATA, "api_stats.json")
+DEFAULT_LIVE = os.path.join(OUTPUT_DATA, "live_client_info.jsonl")
+
+_PAGES_HEADER = re.compile(r"Pages ([\d, ]+) of ")
+_PAGE_HEADER = re.compile(r"Page (\d+) of ")
+MALFORMED_KINDS = ("truncated", "trailing_commas", "no_json")
+
+
+# === Profile ===
+class MockProfile:
+    # Response behaviour of the stand-in endpoint. Latency is log-normal around a power law
+    # of the prompt size, fitted to the recorded (char_count, duration) pairs; response
+    # bodies are sampled from recorded page extractions. Real latencies are multiplied by
+    # `time_scale` so a benchmark over a whole document finishes in seconds.
+
+    def __init__(self, contents, latency_a, latency_b, latency_sigma, time_scale=0.01,
+                 rate_429=0.0, retry_after=1.0, malformed_rate=0.0, tail_rate=0.0, tail_factor=5.0,
+                 response_scale=1.0, rpm_per_key=None):
+        self.contents = contents
+        self.latency_a = latency_a            # log-seconds intercept
+        self.latency_b = latency_b            # exponent on prompt characters
+        self.latency_sigma = latency_sigma    # log-normal spread
+        self.time_scale = time_scale
+        self.rate_429 = rate_429
+        self.retry_after = retry_after        # seconds, already in scaled time
+        self.malformed_rate = malformed_rate
+        self.tail_rate = tail_rate            # share of calls that hit a slow replica
+        self.tail_factor = tail_factor
+        self.response_scale = response_scale  # >1 pads responses with trailing commentary
+        self.rpm_per_key = rpm_per_key        # enforced quota per API key, in scaled time
+
+    @classmethod
+    def from_recorded(cls, stats_path=DEFAULT_STATS, live_path=DEFAULT_LIVE, **overrides):
+        # log(duration) = a + b * log(chars) by least squares; sigma from the residuals
+        samples, contents = [], []
+        if os.path.exists(stats_path):
+            with open(stats_path, "r", encoding="utf-8") as f:
+                samples += [(r["char_count"], r["duration"]) for r in json.load(f) if r.get("duration")]
+        for record, _, _ in iter_live_records(live_path):
+            if is_completed(record):
+                contents.append(record["content"])
+        if not contents:
+            raise SystemExit(f"❌ No recorded page extractions in {live_path}")
+
+        xs = [math.log(max(1, chars)) for chars, _ in samples]
+        ys = [math.log(duration) for _, duration in samples]
+        if len(samples) > 2 and len(set(xs)) > 1:
+            mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+            b = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / sum((x - mean_x) ** 2 for x in xs)
+            a = mean_y - b * mean_x
+            sigma = math.sqrt(sum((y - a - b * x) ** 2 for x, y in zip(xs, ys)) / (len(xs) - 2))
+        else:
+            a, b, sigma = math.log(20.0), 0.0, 0.3
+        return cls(contents, a, b, sigma, **overrides)
+
+    def describe(self):
+        median_page = math.exp(self.latency_a + self.latency_b * math.log(10000))
+        return (f"latency median {median_page:.1f}s per 10k-char prompt (x{self.time_scale:g}), "
+                f"sigma {self.latency_sigma:.2f}, size exponent {self.latency_b:.2f}; "
+                f"429 rate {self.rate_429:.0%}, malformed {self.malformed_rate:.0%}, "
+                f"slow tail {self.tail_rate:.0%} x{self.tail_factor:g}; {len(self.contents)} recorded responses")
+
+    def latency(self, rng, prompt_chars):
+        seconds = math.exp(self.latency_a + self.latency_b * math.log(max(1, prompt_chars))
+                           + rng.gauss(0, self.latency_sigma))
+        if rng.random() < self.tail_rate:
+            seconds *= self.tail_factor
+        return seconds * self.time_scale
+
+
+# === Response Bodies ===
+def page_numbers(prompt):
+    match = _PAGES_HEADER.search(prompt)
+    if match:
+        return [int(n) for n in match.group(1).split(",")]
+    match = _PAGE_HEADER.search(prompt)
+    return [int(match.group(1))] if match else None
+
+
+def response_text(profile, rng, prompt):
+    # Returns (text, kind): a fenced JSON answer, or one of MALFORMED_KINDS
+    numbers = page_numbers(prompt)
+    if numbers and len(numbers) > 1:
+        payload = {"pages": [dict(rng.choice(profile.contents), page_number=n) for n in numbers]}
+    else:
+        payload = dict(rng.choice(profile.contents))
+        if numbers:
+            payload["page_number"] = numbers[0]
+    body = json.dumps(payload, indent=2, ensure_ascii=False)
+
+    kind = "ok"
+    if rng.random() < profile.malformed_rate:
+        kind = rng.choice(MALFORMED_KINDS)
+        if kind == "truncated":
+            body = body[:rng.randint(len(body) // 3, len(body) - 5)]
+        elif kind == "trailing_commas":
+            body = re.sub(r'(null|"|\d|\]|\})(\s*\n\s*[\}\]])', r"\1,\2", body)
+        else:
+            body = "I could not find structured information on this page."
+    text = f"Here is the extracted data:\n```json\n{body}\n```" if kind != "no_json" else body
+    if profile.response_scale > 1:
+        filler = " Fields without evidence on the page were left null."
+        text += filler * int(len(text) * (profile.response_scale - 1) / len(filler))
+    return text, kind
+
+
+# === Server ===
+class MockMistralServer:
+    # Local stand-in for POST /v1/chat/completions. Every call is logged, so a benchmark
+    # can count throttled, malformed and repeated (wasted) calls afterwards.
+
+    def __init__(self, profile, host="127.0.0.1", port=0, seed=7):
+        self.profile = profile
+        self.seed = seed
+        self.calls = []
+        self._attempts = {}  # prompt hash -> calls so far, so responses do not depend on thread timing
+        self._windows = {}   # API key -> recent request times, for rpm_per_key
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _over_quota(self, api_key, now):
+        if not self.profile.rpm_per_key:
+            return False
+        window = self._windows.setdefault(api_key, deque())
+        while window and now - window[0] > 60.0:
+            window.popleft()
+        if len(window) >= self.profile.rpm_per_key:
+            return True
+        window.append(now)
+        return False
+
+    def handle(self, api_key, body):
+        # Returns (status, headers, payload bytes) and logs the call
+        started = time.time()
+        prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+        prompt_hash = hashlib.sha1(prompt.encode("utf-8")).hexdigest()
+        with self._lock:
+            attempt = self._attempts.get(prompt_hash, 0)
+            self._attempts[prompt_hash] = attempt + 1
+            over_quota = self._over_quota(api_key, time.monotonic())
+        rng = random.Random(f"{self.seed}:{prompt_hash}:{attempt}")
+        call = {"key": api_key, "prompt_hash": prompt_hash, "attempt": attempt,
+                "prompt_chars": len(prompt), "started": started}
+
+        if over_quota or rng.random() < self.profile.rate_429:
+            call.update(status=429, kind="throttled", finished=time.time(), response_bytes=0)
+            with self._lock:
+                self.calls.append(call)
+            payload = json.dumps({"message": "Requests rate limit exceeded"}).encode()
+            return 429, {"Retry-After": f"{self.profile.retry_after:g}"}, payload
+
+        time.sleep(self.profile.latency(rng, len(prompt)))
+        text, kind = response_text(self.profile, rng, prompt)
+        prompt_tokens, completion_tokens = len(prompt) // 4, len(text) // 4
+        payload = json.dumps({
+            "id": f"mock-{prompt_hash[:12]}-{attempt}",
+            "object": "chat.completion",
+            "created": int(started),
+            "model": body.get("model", "mistral-large-latest"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }, ensure_ascii=False).encode("utf-8")
+        call.update(status=200, kind=kind, finished=time.time(), response_bytes=len(payload))
+        with self._lock:
+            self.calls.append(call)
+        return 200, {"Content-Type": "application/json"}, payload
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                api_key = (self.headers.get("Authorization") or "").removeprefix("Bearer ")
+                status, headers, payload = server.handle(api_key, body)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+    def summary(self):
+        # Wasted calls: throttled ones, plus any call for a prompt that already got a
+        # well-formed answer (client retries and duplicate sends)
+        calls = sorted(self.calls, key=lambda c: c["started"])
+        answered = set()
+        wasted = 0
+        counts = {"calls": len(calls), "throttled": 0, "malformed": 0, "repeats": 0}
+        for call in calls:
+            if call["status"] == 429:
+                counts["throttled"] += 1
+                wasted += 1
+                continue
+            if call["kind"] != "ok":
+                counts["malformed"] += 1
+            if call["prompt_hash"] in answered:
+                counts["repeats"] += 1
+                wasted += 1
+            elif call["kind"] == "ok":
+                answered.add(call["prompt_hash"])
+        counts["wasted"] = wasted
+        counts["response_mb"] = sum(c["response_bytes"] for c in calls) / 1e6
+        return counts
+
+
+# === Client Redirect ===
+SITECUSTOMIZE = '''import os
+import mistralai
+
+_mistral_init = mistralai.Mistral.__init__
+
+
+def _mock_init(self, *args, **kwargs):
+    kwargs["server_url"] = os.environ["MOCK_MISTRAL_URL"]
+    _mistral_init(self, *args, **kwargs)
+
+
+mistralai.Mistral.__init__ = _mock_init
+'''
+
+
+def write_client_redirect(directory):
+    # A sitecustomize module that points every Mistral client at MOCK_MISTRAL_URL; put the
+    # directory on PYTHONPATH of the process under test (inherited by its worker processes)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "sitecustomize.py"), "w", encoding="utf-8") as f:
+        f.write(SITECUSTOMIZE)
+    return directory
+
+
+def add_profile_arguments(parser):
+    group = parser.add_argument_group("mock endpoint")
+    group.add_argument("--stats", default=DEFAULT_STATS, help="Recorded per-page durations (api_stats.json)")
+    group.add_argument("--live", default=DEFAULT_LIVE, help="Recorded page extractions (live_client_info.jsonl)")
+    group.add_argument("--time_scale", type=float, default=0.01, help="Multiplier on recorded latencies")
+    group.add_argument("--latency_median", type=float, default=None,
+                       help="Override: median seconds for a 10k-char prompt (before --time_scale)")
+    group.add_argument("--latency_sigma", type=float, default=None, help="Override: log-normal spread")
+    group.add_argument("--tail_rate", type=float, default=0.0, help="Share of calls that are --tail_factor slower")
+    group.add_argument("--tail_factor", type=float, default=5.0)
+    group.add_argument("--rate_429", type=float, default=0.02, help="Chance a call is answered 429")
+    group.add_argument("--retry_after", type=float, default=0.5, help="Retry-After on 429s (scaled seconds)")
+    group.add_argument("--rpm_per_key", type=float, default=None, help="Enforced requests/min per key (scaled time)")
+    group.add_argument("--malformed_rate", type=float, default=0.05, help="Chance a 200 carries broken JSON")
+    group.add_argument("--response_scale", type=float, default=1.0, help="Response size multiplier")
+    group.add_argument("--seed", type=int, default=7)
+
+
+def profile_from_args(args):
+    profile = MockProfile.from_recorded(
+        args.stats, args.live, time_scale=args.time_scale, rate_429=args.rate_429,
+        retry_after=args.retry_after, malformed_rate=args.malformed_rate, tail_rate=args.tail_rate,
+        tail_factor=args.tail_factor, response_scale=args.response_scale, rpm_per_key=args.rpm_per_key
+    )
+    if args.latency_median is not None:
+        profile.latency_a = math.log(args.latency_median) - profile.latency_b * math.log(10000)
+    if args.latency_sigma is not None:
+        profile.latency_sigma = args.latency_sigma
+    return profile
+
+
+# === Standalone Server ===
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the Mistral chat completion endpoint")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--redirect_dir", default=None,
+                        help="Also write a sitecustomize.py here that points Mistral clients at this server")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockMistralServer(profile_from_args(args), port=args.port, seed=args.seed)
+    if args.redirect_dir:
+        write_client_redirect(args.redirect_dir)
+        print(f"↪️ PYTHONPATH={args.redirect_dir} MOCK_MISTRAL_URL={server.url}")
+    print(f"🧪 Mock Mistral on {server.url}: {server.profile.describe()}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"📊 {server.summary()}")
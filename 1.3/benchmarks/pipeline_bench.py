@@ -0,0 +1,176 @@
+import os
+import re
+import sys
+import json
+import time
+import shlex
+import argparse
+import tempfile
+import subprocess
+
+from mock_mistral import MockMistralServer, add_profile_arguments, profile_from_args, write_client_redirect
+from fixture_pdfs import generate_fixture_set
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.dirname(os.path.dirname(HERE))
+_PAGE_START = re.compile(r"^=== START OF PAGE \d+ ON PDF .+ ===$", re.MULTILINE)
+
+# Entry script of each pipeline iteration
+VARIANTS = {
+    "1.3": os.path.join(REPO, "1.3", "summarize_data.py"),
+    "1.2": os.path.join(REPO, "previous_iterations", "1.2", "summarize_data.py"),
+    "1.1": os.path.join(REPO, "previous_iterations", "1.1", "run_mistral_parallel.py"),
+}
+
+# === ARG PARSING ===
+parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark against a local mock Mistral endpoint")
+parser.add_argument("--input_text", default=os.path.join(REPO, "OutputData", "final_output.txt"))
+parser.add_argument("--variants", nargs="+", choices=sorted(VARIANTS), default=["1.3", "1.2", "1.1"])
+parser.add_argument("--keys", type=int, default=2, help="API keys given to 1.3 (1.1/1.2 always use two)")
+parser.add_argument("--requests_per_minute", type=float, default=6000,
+                    help="Per-key quota passed to 1.3 (scaled time, like --rpm_per_key)")
+parser.add_argument("--extra_args", default="", help="Extra arguments for 1.3, e.g. \"--concurrency_per_key 4\"")
+parser.add_argument("--work_dir", default=None, help="Keep outputs and logs here (default: a temp dir)")
+parser.add_argument("--report", default=None, help="Also write the results as JSON")
+parser.add_argument("--pdf_fixtures", type=int, default=0,
+                    help="Run 1.3 on this many generated fixture PDFs (pages from --input_text) instead of the "
+                         "text file, and exit non-zero unless every page comes out")
+parser.add_argument("--fixture_pages", type=int, default=12, help="Pages per fixture PDF")
+add_profile_arguments(parser)
+args = parser.parse_args()
+
+
+# === Runs ===
+def variant_command(variant, out_dir, fixture_dir=None):
+    paths = {name: os.path.join(out_dir, name) for name in ("results.json", "stats.json", "live.jsonl", "documents")}
+    common = ["--output_json", paths["results.json"], "--output_stats", paths["stats.json"],
+              "--live_output", paths["live.jsonl"]]
+    if fixture_dir is not None:
+        # PDF batch: text extraction on the process pool feeds the LLM stage
+        command = ["--batch", fixture_dir, "--output_dir", paths["documents"], "--live_output", paths["live.jsonl"],
+                   "--requests_per_minute", str(args.requests_per_minute), *shlex.split(args.extra_args)]
+        return [sys.executable, VARIANTS[variant], *command], paths["documents"]
+    if variant == "1.3":
+        command = ["--input_text", args.input_text, *common,
+                   "--requests_per_minute", str(args.requests_per_minute), *shlex.split(args.extra_args)]
+    elif variant == "1.2":
+        command = ["--input_text", args.input_text, *common, "--wait_time", "0"]
+    else:
+        command = ["--input_html", args.input_text, *common, "--wait_time", "0"]
+    return [sys.executable, VARIANTS[variant], *command], paths["stats.json"]
+
+
+def page_latencies(variant, stats):
+    # 1.3 reports one record per page; older iterations one per chunk, whose duration
+    # every page in the chunk waited for
+    if variant == "1.3":
+        return [r["duration"] for r in stats if "duration" in r and r.get("triage") != "skip"]
+    return [r["duration"] for r in stats for _ in range(max(1, round(r.get("estimated_pages", 1))))]
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))]
+
+
+def peak_rss_mb(usage):
+    # ru_maxrss is KiB on Linux and bytes on macOS; it covers the process and its waited-for workers
+    return usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def load_stats(stats_path):
+    # One stats file, or every per-document <stem>_api_stats.json of a batch run
+    if not os.path.isdir(stats_path):
+        with open(stats_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    stats = []
+    for name in sorted(os.listdir(stats_path)):
+        if name.endswith("_api_stats.json"):
+            with open(os.path.join(stats_path, name), "r", encoding="utf-8") as f:
+                stats.extend(json.load(f))
+    return stats
+
+
+def run_variant(variant, pages, redirect_dir, work_dir, fixture_dir=None):
+    out_dir = os.path.join(work_dir, variant)
+    os.makedirs(out_dir, exist_ok=True)
+    command, stats_path = variant_command(variant, out_dir, fixture_dir)
+    with MockMistralServer(profile_from_args(args), seed=args.seed) as server:
+        env = dict(os.environ,
+                   PYTHONPATH=os.pathsep.join(filter(None, [redirect_dir, os.environ.get("PYTHONPATH")])),
+                   MOCK_MISTRAL_URL=server.url,
+                   MISTRAL_API_KEYS=",".join(f"bench-key-{i + 1}" for i in range(args.keys)),
+                   MISTRAL_API_KEY="bench-key-1", MISTRAL_API_KEY2="bench-key-2")
+        with open(os.path.join(out_dir, "run.log"), "wb") as log:
+            start = time.perf_counter()
+            process = subprocess.Popen(command, cwd=os.path.dirname(VARIANTS[variant]),
+                                       env=env, stdout=log, stderr=subprocess.STDOUT)
+            _, status, usage = os.wait4(process.pid, 0)
+            elapsed = time.perf_counter() - start
+        process.returncode = os.waitstatus_to_exitcode(status)
+        calls = server.summary()
+
+    if process.returncode != 0 or not os.path.exists(stats_path):
+        print(f"❌ {variant} exited with {process.returncode}; see {os.path.join(out_dir, 'run.log')}")
+        return None
+    stats = load_stats(stats_path)
+    if fixture_dir is not None:
+        done = {(r["file_name"], r["page_number"]) for r in stats if "page_number" in r}
+        if len(done) != pages:
+            print(f"❌ {variant} returned {len(done)} of {pages} fixture pages; see {os.path.join(out_dir, 'run.log')}")
+            return None
+    latencies = page_latencies(variant, stats)
+    return {
+        "variant": variant,
+        "seconds": elapsed,
+        "pages_per_min": pages / elapsed * 60,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "peak_rss_mb": peak_rss_mb(usage),
+        **calls,
+    }
+
+
+if __name__ == "__main__":
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="pipeline_bench_")
+    redirect_dir = write_client_redirect(os.path.join(work_dir, "redirect"))
+    fixture_dir = None
+    variants = args.variants
+    if args.pdf_fixtures:
+        # Only 1.3 reads PDFs
+        fixture_dir = os.path.join(work_dir, "fixtures")
+        generate_fixture_set(fixture_dir, args.pdf_fixtures, args.fixture_pages, args.input_text, args.seed)
+        pages = args.pdf_fixtures * args.fixture_pages
+        variants = ["1.3"]
+        print(f"🧪 {pages} pages in {args.pdf_fixtures} fixture PDFs → {fixture_dir}")
+    else:
+        with open(args.input_text, "r", encoding="utf-8") as f:
+            text = f.read()
+        pages = len(_PAGE_START.findall(text)) or max(1, round(len(text) / 2000))
+        print(f"🧪 {pages} pages from {args.input_text}")
+    print(f"🧪 Mock endpoint: {profile_from_args(args).describe()}\n")
+
+    results = []
+    failed = False
+    for variant in variants:
+        result = run_variant(variant, pages, redirect_dir, work_dir, fixture_dir)
+        if result is None:
+            failed = True
+            continue
+        results.append(result)
+        print(f"✅ {variant} finished in {result['seconds']:.1f}s")
+
+    print(f"\n  {'variant':>7} {'pages/min':>10} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} "
+          f"{'calls':>6} {'429s':>5} {'bad JSON':>8} {'wasted':>7} {'peak RSS':>9}")
+    for r in results:
+        print(f"  {r['variant']:>7} {r['pages_per_min']:>10.1f} {r['p50']:>7.2f} {r['p95']:>7.2f} {r['p99']:>7.2f} "
+              f"{r['calls']:>6} {r['throttled']:>5} {r['malformed']:>8} {r['wasted']:>7} {r['peak_rss_mb']:>7.1f}MB")
+    print(f"\n📁 Outputs and logs in {work_dir}")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if fixture_dir is not None and failed:
+        sys.exit(1)
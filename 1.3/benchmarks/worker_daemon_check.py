@@ -0,0 +1,69 @@
+import os
+import sys
+import json
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from worker_daemon import JobStore, make_handler
+
+# Offline check of the worker's HTTP API: job specs are confined to --data_root, relative
+# paths (and the consolidation defaults derived from them) resolve inside it, and bad
+# list limits are rejected. No API keys or jobs are run; exits non-zero on a failure.
+
+
+def request(url, method="GET", body=None):
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    req = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+def check(name, ok, detail=""):
+    print(f"{'✅' if ok else '❌'} {name}{f': {detail}' if detail and not ok else ''}")
+    return ok
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory(prefix="worker_daemon_check_") as work_dir:
+        data_root = os.path.realpath(os.path.join(work_dir, "root"))
+        os.makedirs(os.path.join(data_root, "in"))
+        store = JobStore(os.path.join(work_dir, "jobs.db"))
+        httpd = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(store, 0, data_root))
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{httpd.server_address[1]}"
+        base = {"input_text": "in/a.txt", "output_json": "out/a.json", "output_stats": "out/a_stats.json",
+                "live_output": "out/live.jsonl"}
+        results = []
+        try:
+            status, job = request(f"{url}/jobs", "POST", dict(base, consolidate_dir="client/output", client_id="c1"))
+            spec = job.get("spec", {})
+            results.append(check("relative consolidate_dir is accepted", status == 201, job))
+            results.append(check(
+                "consolidation dirs resolve under the data root",
+                (spec.get("consolidate_dir"), spec.get("json_dir"), spec.get("database_dir")) == (
+                    os.path.join(data_root, "client", "output"),
+                    os.path.join(data_root, "client", "JSONdata"),
+                    os.path.join(data_root, "client", "DataForDatabase")),
+                spec))
+            status, job = request(f"{url}/jobs", "POST", dict(base, consolidate_dir=".", client_id="c1"))
+            results.append(check("consolidation defaults outside the root are rejected", status == 400, job))
+            for field, value in (("input_text", "/etc/passwd"), ("output_json", "../a.json")):
+                status, job = request(f"{url}/jobs", "POST", dict(base, **{field: value}))
+                results.append(check(f"{field}={value} is rejected", status == 400, job))
+            for limit in ("x", "0"):
+                status, body = request(f"{url}/jobs?limit={limit}")
+                results.append(check(f"limit={limit} is rejected", status == 400, body))
+            status, body = request(f"{url}/jobs?limit=1")
+            results.append(check("limit=1 lists one job", status == 200 and len(body["jobs"]) == 1, body))
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,99 @@
+import os
+import json
+
+# === Live Log Reader ===
+_decoder = json.JSONDecoder()
+
+
+def iter_live_records(path, chunk_size=1 << 16):
+    # Yields (record, start_byte, end_byte) for every complete JSON object in the live log.
+    # Handles both pretty-printed records and compact JSONL, skips corrupt records
+    # and stops quietly at a record that was cut off by a crash.
+    if not os.path.exists(path):
+        return
+
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = ""
+        pos = 0
+        offset = 0  # byte offset of buffer[pos] in the file
+        eof = False
+
+        def skip(to):
+            nonlocal pos, offset
+            offset += len(buffer[pos:to].encode("utf-8"))
+            pos = to
+
+        while True:
+            # Step over inter-record whitespace in place; slicing the buffer per record is quadratic
+            next_char = pos
+            while next_char < len(buffer) and buffer[next_char] in " \t\r\n":
+                next_char += 1
+            if next_char > pos:
+                skip(next_char)
+
+            if pos < len(buffer):
+                try:
+                    record, end = _decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    record = None
+                if record is not None:
+                    start = offset
+                    skip(end)
+                    if isinstance(record, dict):
+                        yield record, start, offset
+                    continue
+
+            if not eof:
+                chunk = f.read(chunk_size)
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                eof = not chunk
+                continue
+
+            if pos >= len(buffer):
+                return
+            # Resync on the next record that starts a line, or give up on a truncated tail
+            next_start = buffer.find("\n{", pos + 1)
+            if next_start == -1:
+                return
+            print(f"⚠️ Skipping corrupt live log record at byte {offset}")
+            skip(next_start + 1)
+
+
+# === Checkpoint ===
+def is_completed(record):
+    content = record.get("content")
+    return isinstance(content, dict) and "error" not in content
+
+
+def load_checkpoint(path, file_name=None):
+    # Byte span (start, end) of the latest successful record per (file_name, page_number),
+    # plus the offset where the last complete record ends, so a half-written tail can be
+    # cut off before appending. Records stay on disk; only their spans are kept.
+    completed = {}
+    valid_end = 0
+    for record, start, end in iter_live_records(path):
+        valid_end = end
+        if file_name is not None and record.get("file_name") != file_name:
+            continue
+        if is_completed(record):
+            completed[(record.get("file_name"), record.get("page_number"))] = (start, end)
+    return completed, valid_end
+
+
+def truncate_partial_tail(path, valid_end):
+    # Cut a half-written record off the end of the log so new records append cleanly
+    if os.path.exists(path) and os.path.getsize(path) > valid_end:
+        with open(path, "r+b") as f:
+            f.seek(valid_end)
+            if f.read().strip():
+                f.truncate(valid_end)
+                f.seek(valid_end)
+                f.write(b"\n")
+
+
+def read_record(path, span):
+    # One record back out of the live log by its (start, end) byte span
+    with open(path, "rb") as f:
+        f.seek(span[0])
+        return json.loads(f.read(span[1] - span[0]))
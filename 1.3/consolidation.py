@@ -0,0 +1,315 @@
+import os
+import re
+import json
+from datetime import datetime
+from collections import Counter, defaultdict
+
+# === Field Rules ===
+MULTI_VALUE_FIELDS = {
+    "medications", "allergies", "therapists", "physicians", "surgeries",
+    "hospitalizations", "diagnosis", "lab_results", "imaging_results", "functional_assessments",
+    "colleagues", "job_duties", "assets", "liabilities", "bank_statements", "expenses", "courses_taken"
+}
+NAME_FIELDS = {
+    "name", "physician", "physicians", "therapists", "supervisors", "colleagues",
+    "family_member_name", "judge", "attorneys"
+}
+VISITS_SECTION = "MedicalVisits"
+
+_WHITESPACE = re.compile(r"\s+")
+_CREDENTIALS = re.compile(r",?\s+(?:M\.?D|D\.?O|Ph\.?D|Psy\.?D|N\.?P|P\.?A-C|R\.?N|LCSW|DPT|PT)\.?$")
+# "Voss, Christopher" / "Anderson, Mark D.": a single surname, a comma, then given names
+_LAST_FIRST = re.compile(r"^([^\W\d_][\w'\-]*),\s*([^\W\d_][\w'\-.]*(?:\s+[^\W\d_][\w'\-.]*){0,2})$")
+
+
+# === Normalization ===
+def normalize_value(field_key, value):
+    value = _WHITESPACE.sub(" ", value).strip(" ;,")
+    if field_key in NAME_FIELDS:
+        value = _CREDENTIALS.sub("", value)
+        match = _LAST_FIRST.match(value)
+        if match:
+            value = f"{match.group(2)} {match.group(1)}"
+    return value
+
+
+def split_values(field_key, value):
+    # One extracted field -> the list of values it contributes
+    if isinstance(value, list):
+        items = value
+    elif isinstance(value, str) and field_key in MULTI_VALUE_FIELDS:
+        # A lone "Last, First" is one name, not two values
+        if field_key in NAME_FIELDS and _LAST_FIRST.match(_WHITESPACE.sub(" ", value).strip()):
+            items = [value]
+        else:
+            items = value.split(",")
+    else:
+        items = [value]
+
+    values = []
+    for item in items:
+        if not item:
+            continue
+        item = json.dumps(item, sort_keys=True) if isinstance(item, (dict, list)) else str(item)
+        item = normalize_value(field_key, item)
+        if item and item not in values:
+            values.append(item)
+    return values
+
+
+def flatten_response(content):
+    # {"Section": {"field": value}} -> {"Section.field": [values]}, dropping empty fields
+    flat = {}
+    for section, fields in content.items():
+        if not isinstance(fields, dict):
+            continue
+        for key, value in fields.items():
+            values = split_values(key, value)
+            if values:
+                flat[f"{section}.{key}"] = values
+    return flat
+
+
+def page_visits(content):
+    visits = content.get(VISITS_SECTION) or []
+    return [
+        {k: v for k, v in visit.items() if k != "source"}
+        for visit in visits if isinstance(visit, dict) and any(visit.values())
+    ]
+
+
+def parse_date_safe(date_str):
+    if not isinstance(date_str, str):
+        return None
+    for fmt in ("%Y-%m-%d", "%m/%d/%Y", "%Y/%m/%d"):
+        try:
+            return datetime.strptime(date_str, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def visit_summary(visit):
+    return "; ".join(f"{k}: {v}" for k, v in visit.items() if v)
+
+
+def citation(file_name, page_number):
+    return f"(page {page_number}, {file_name})"
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+# === Consolidator ===
+class Consolidator:
+    # Keeps the consolidated view of one client's page results and updates it one page at
+    # a time. Each page's contribution (flattened fields + visits) is stored, so a page
+    # that is re-extracted replaces its old values instead of adding to them. Contributions
+    # persist in a JSONL state file, so a later run only adds its own pages.
+
+    STATE_FILE = "consolidation_state.jsonl"
+
+    def __init__(self, output_dir, json_dir, database_dir, client_id):
+        self.output_dir = output_dir
+        self.json_dir = json_dir
+        self.database_dir = database_dir
+        self.client_id = client_id
+        for path in (output_dir, json_dir, database_dir):
+            os.makedirs(path, exist_ok=True)
+
+        self.pages = {}                    # (file_name, page_number) -> {"fields": ..., "visits": ...}
+        self.counts = defaultdict(Counter)  # field -> normalized value -> count
+        self.dirty = set()                 # fields whose section files need rewriting
+        self._state_lines = 0
+        self.state_path = os.path.join(output_dir, self.STATE_FILE)
+        self._load_state()
+        self._state_file = open(self.state_path, "a", encoding="utf-8")
+
+    def _load_state(self):
+        if not os.path.exists(self.state_path):
+            return
+        with open(self.state_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue  # torn final line from an interrupted run
+                self._apply((row["file_name"], row["page_number"]), row["fields"], row["visits"])
+                self._state_lines += 1
+        self.dirty.clear()
+
+    def _apply(self, key, fields, visits):
+        old = self.pages.pop(key, None)
+        if old is not None:
+            for field, values in old["fields"].items():
+                self.counts[field].subtract(values)
+                self.counts[field] += Counter()  # drop values that fell to zero
+                self.dirty.add(field)
+            if old["visits"]:
+                self.dirty.add(VISITS_SECTION)
+        if fields or visits:
+            self.pages[key] = {"fields": fields, "visits": visits}
+        for field, values in fields.items():
+            self.counts[field].update(values)
+            self.dirty.add(field)
+        if visits:
+            self.dirty.add(VISITS_SECTION)
+
+    def add(self, record):
+        # Folds one successful page record in; returns False when nothing changed
+        content = record.get("content")
+        if not isinstance(content, dict) or "error" in content:
+            return False
+        key = (record["file_name"], record["page_number"])
+        fields = flatten_response(content)
+        visits = page_visits(content)
+        current = self.pages.get(key)
+        if current == {"fields": fields, "visits": visits} or (current is None and not fields and not visits):
+            return False
+
+        self._apply(key, fields, visits)
+        self._state_file.write(json.dumps({
+            "file_name": key[0], "page_number": key[1], "fields": fields, "visits": visits
+        }, ensure_ascii=False) + "\n")
+        self._state_lines += 1
+        return True
+
+    # === Views ===
+    def _field_entries(self):
+        entries = defaultdict(list)
+        for (file_name, page_number), contribution in sorted(self.pages.items()):
+            for field, values in contribution["fields"].items():
+                entries[field].append(((file_name, page_number), values))
+        return entries
+
+    def _sorted_visits(self):
+        visits = [
+            dict(visit, source={"file": file_name, "page": page_number})
+            for (file_name, page_number), contribution in sorted(self.pages.items())
+            for visit in contribution["visits"]
+        ]
+        return sorted(visits, key=lambda v: parse_date_safe(v.get("date")) or datetime.min)
+
+    def _insert_records(self, section, rag_items):
+        # One record per distinct text per file; pages where the same text appears are merged
+        grouped = {}
+        for text, file_name, page_number in rag_items:
+            grouped.setdefault((text, file_name), set()).add(page_number)
+        return [
+            {
+                "id": f"{self.client_id}_{section}",
+                "text": f"{section}: {text}",
+                "metadata": {
+                    "client_id": self.client_id,
+                    "section": section,
+                    "field": "",
+                    "content": text,
+                    "citation": {"file": file_name, "pages": sorted(pages)}
+                }
+            }
+            for (text, file_name), pages in grouped.items()
+        ]
+
+    # === Outputs ===
+    def flush(self):
+        # Rewrites the combined outputs and only the per-section files that changed
+        self._state_file.flush()
+        entries = self._field_entries()
+        visits = self._sorted_visits()
+
+        consolidated = {
+            field: [{"value": value, "source": {"file": key[0], "page": key[1]}}
+                    for key, values in page_values for value in values]
+            for field, page_values in entries.items()
+        }
+        consolidated[VISITS_SECTION] = visits
+
+        rag_items = {
+            field: [("; ".join(values), key[0], key[1]) for key, values in page_values]
+            for field, page_values in entries.items()
+        }
+        if visits:
+            rag_items[VISITS_SECTION] = [
+                (visit_summary({k: v for k, v in visit.items() if k != "source"}),
+                 visit["source"]["file"], visit["source"]["page"])
+                for visit in visits
+            ]
+        rag_friendly = {
+            field: [f"{text} {citation(file_name, page)}" for text, file_name, page in items]
+            for field, items in rag_items.items()
+        }
+
+        _write_json(os.path.join(self.output_dir, "final_consolidated_output.json"), consolidated)
+        _write_json(os.path.join(self.output_dir, "field_value_counts.json"),
+                    {field: dict(counts) for field, counts in self.counts.items() if counts})
+        _write_json(os.path.join(self.output_dir, "final_rag_friendly_output.json"), rag_friendly)
+
+        all_insertions = []
+        for section in sorted(set(rag_items) | self.dirty):
+            json_path = os.path.join(self.json_dir, f"{section}.json")
+            insert_path = os.path.join(self.database_dir, f"{section}_insert.json")
+            inserts = self._insert_records(section, rag_items.get(section, []))
+            all_insertions.extend(inserts)
+            if section not in self.dirty:
+                continue
+            if section in rag_items:
+                _write_json(json_path, rag_friendly[section])
+                _write_json(insert_path, inserts)
+            else:
+                for path in (json_path, insert_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+        _write_json(os.path.join(self.database_dir, "all_insertions.json"), all_insertions)
+        self.dirty.clear()
+
+        if self._state_lines > 2 * max(1, len(self.pages)):
+            self._compact_state()
+
+    def _compact_state(self):
+        # Drops superseded page contributions from the state file
+        self._state_file.close()
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for (file_name, page_number), contribution in self.pages.items():
+                f.write(json.dumps({
+                    "file_name": file_name, "page_number": page_number, **contribution
+                }, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.state_path)
+        self._state_lines = len(self.pages)
+        self._state_file = open(self.state_path, "a", encoding="utf-8")
+
+    def close(self):
+        if not self._state_file.closed:
+            self.flush()
+            self._state_file.close()
+
+
+# === Standalone Rebuild ===
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fold page results into the consolidated and insertion outputs")
+    parser.add_argument("--results", required=True, help="api_results.json or a live JSONL log")
+    parser.add_argument("--output_dir", required=True)
+    parser.add_argument("--json_dir", required=True)
+    parser.add_argument("--database_dir", required=True)
+    parser.add_argument("--client_id", required=True, help="e.g. Voss-1234 (last name - last 4 of SSN)")
+    args = parser.parse_args()
+
+    from checkpoint import iter_live_records
+
+    consolidator = Consolidator(args.output_dir, args.json_dir, args.database_dir, args.client_id)
+    if args.results.endswith(".json"):
+        with open(args.results, "r", encoding="utf-8") as f:
+            records = json.load(f)
+    else:
+        records = (record for record, _, _ in iter_live_records(args.results))
+    changed = sum(consolidator.add(record) for record in records)
+    consolidator.close()
+    print(f"✅ Consolidated {changed} new or changed pages for {args.client_id} ({len(consolidator.pages)} pages total)")
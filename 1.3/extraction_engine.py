@@ -0,0 +1,121 @@
+import os
+import time
+import asyncio
+import inspect
+
+# === API Keys ===
+def load_api_keys(environ=None):
+    # MISTRAL_API_KEYS="k1,k2,..." or MISTRAL_API_KEY, MISTRAL_API_KEY2, MISTRAL_API_KEY3, ...
+    environ = os.environ if environ is None else environ
+    keys = [k.strip() for k in environ.get("MISTRAL_API_KEYS", "").split(",") if k.strip()]
+
+    if environ.get("MISTRAL_API_KEY"):
+        keys.append(environ["MISTRAL_API_KEY"])
+    index = 2
+    while environ.get(f"MISTRAL_API_KEY{index}"):
+        keys.append(environ[f"MISTRAL_API_KEY{index}"])
+        index += 1
+
+    return list(dict.fromkeys(keys))
+
+
+# === Key Slots ===
+class KeySlot:
+    # One API key with its client and rate limiter; shared by every concurrent request on that key
+    def __init__(self, key_id, client, limiter):
+        self.key_id = key_id
+        self.client = client
+        self.limiter = limiter
+        self.in_flight = 0
+        # Optional asyncio.Semaphore capping requests on this key across every engine using it
+        self.slots = None
+
+
+# === Shared-Queue Engine ===
+_DONE = object()
+
+
+async def _maybe_await(value):
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+
+class ExtractionEngine:
+    # Every (key, slot) pair pulls the next job from one shared queue, so a key that
+    # finishes a short page immediately takes the next one instead of idling.
+
+    def __init__(self, key_slots, handle_job, concurrency_per_key=1, queue_size=None, metrics=None):
+        self.key_slots = key_slots
+        self.handle_job = handle_job
+        self.concurrency_per_key = max(1, concurrency_per_key)
+        # Bounded so a streaming job source is only read as fast as slots free up
+        self.queue_size = queue_size if queue_size is not None else 2 * self.worker_count
+        self.metrics = metrics  # optional MetricsRegistry: queue wait, in-flight per key
+
+    @property
+    def worker_count(self):
+        return len(self.key_slots) * self.concurrency_per_key
+
+    async def _produce(self, jobs, queue):
+        try:
+            if hasattr(jobs, "__aiter__"):
+                async for job in jobs:
+                    await queue.put((job, time.perf_counter()))
+                    # An async source may have its next job ready without suspending
+                    await asyncio.sleep(0)
+            else:
+                for job in jobs:
+                    await queue.put((job, time.perf_counter()))
+                    # Let slots start on the first jobs while a generator is still producing
+                    await asyncio.sleep(0)
+        finally:
+            for _ in range(self.worker_count):
+                await queue.put(_DONE)
+
+    async def _work(self, key_slot, queue, on_result):
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                return
+            job, queued_at = item
+            if key_slot.slots is not None:
+                async with key_slot.slots:
+                    result = await self._handle(key_slot, job, queued_at, queue)
+            else:
+                result = await self._handle(key_slot, job, queued_at, queue)
+            await _maybe_await(on_result(result))
+
+    async def _handle(self, key_slot, job, queued_at, queue):
+        key_slot.in_flight += 1
+        if self.metrics is not None:
+            self.metrics.observe("stage_seconds", time.perf_counter() - queued_at, stage="queue_wait")
+            self.metrics.set("in_flight_requests", key_slot.in_flight, key=key_slot.key_id)
+            self.metrics.set("queue_depth", queue.qsize())
+        try:
+            return await self.handle_job(key_slot, job)
+        finally:
+            key_slot.in_flight -= 1
+            if self.metrics is not None:
+                self.metrics.set("in_flight_requests", key_slot.in_flight, key=key_slot.key_id)
+
+    async def run(self, jobs, on_result):
+        if not self.key_slots:
+            raise ValueError("ExtractionEngine needs at least one API key")
+
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        workers = [
+            asyncio.create_task(self._work(key_slot, queue, on_result))
+            for key_slot in self.key_slots
+            for _ in range(self.concurrency_per_key)
+        ]
+        producer = asyncio.create_task(self._produce(jobs, queue))
+
+        try:
+            await asyncio.gather(producer, *workers)
+            if self.metrics is not None:
+                self.metrics.set("queue_depth", 0)
+        except BaseException:
+            for task in [producer, *workers]:
+                task.cancel()
+            raise
@@ -0,0 +1,125 @@
+import time
+import asyncio
+from collections import deque
+
+
+# === Latency Window ===
+class LatencyTracker:
+    # Durations of recent completed requests, for percentile thresholds
+    def __init__(self, window=200):
+        self.samples = deque(maxlen=window)
+
+    def observe(self, seconds):
+        self.samples.append(seconds)
+
+    def percentile(self, q):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+# === Hedging ===
+class HedgePolicy:
+    # A request still running past the `percentile` of recent latencies gets a duplicate
+    # on the least busy key with spare capacity; the first valid answer wins and the other
+    # request is cancelled. Duplicates are capped at `budget` x primary requests.
+
+    poll_floor = 0.05  # seconds between checks for a free slot once past the threshold
+
+    def __init__(self, percentile=90, budget=0.1, min_samples=10, window=200):
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.latency = LatencyTracker(window)
+        self.requests = 0
+        self.hedges = 0
+        self.wins = 0
+
+    def threshold(self):
+        if len(self.latency.samples) < self.min_samples:
+            return None
+        return self.latency.percentile(self.percentile)
+
+    def within_budget(self):
+        return self.hedges + 1 <= self.budget * self.requests
+
+    @staticmethod
+    def spare_slot(key_slots, busy_slot, capacity):
+        # Least busy other key with a free slot; the same key only if no other key has one.
+        # While the queue is full every slot is busy, so hedges go out in the straggler tail.
+        def spare(slot):
+            return slot.in_flight < capacity and (slot.slots is None or not slot.slots.locked())
+
+        candidates = [s for s in key_slots if s is not busy_slot and spare(s)]
+        if not candidates and spare(busy_slot):
+            candidates = [busy_slot]
+        return min(candidates, key=lambda s: s.in_flight, default=None)
+
+    async def _timed(self, attempt, key_slot):
+        start = time.perf_counter()
+        result = await attempt(key_slot)
+        self.latency.observe(time.perf_counter() - start)
+        return result
+
+    async def run(self, attempt, key_slot, key_slots, capacity, is_valid, metrics=None):
+        # attempt(key_slot) -> result; returns (result, key_slot that produced it, hedged)
+        self.requests += 1
+        if metrics is not None:
+            metrics.inc("hedge_requests_total")
+        primary = asyncio.ensure_future(self._timed(attempt, key_slot))
+        tasks = {primary: key_slot}
+        hedge_slot = None
+        holds_slot = False
+        try:
+            threshold = self.threshold()
+            if threshold is not None:
+                done, _ = await asyncio.wait({primary}, timeout=threshold)
+                # Past the threshold: duplicate as soon as some key has a free slot
+                while not done and self.within_budget():
+                    hedge_slot = self.spare_slot(key_slots, key_slot, capacity)
+                    if hedge_slot is not None:
+                        # Take one of the key's shared slots (the daemon's per-key cap); spare_slot
+                        # saw it unlocked, so this returns without waiting
+                        if hedge_slot.slots is not None:
+                            await hedge_slot.slots.acquire()
+                            holds_slot = True
+                        self.hedges += 1
+                        hedge_slot.in_flight += 1
+                        tasks[asyncio.ensure_future(self._timed(attempt, hedge_slot))] = hedge_slot
+                        if metrics is not None:
+                            metrics.inc("hedges_total", outcome="sent")
+                        break
+                    done, _ = await asyncio.wait({primary}, timeout=max(self.poll_floor, threshold / 10))
+
+            pending = set(tasks)
+            fallback = None
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = error or task.exception()
+                        continue
+                    if is_valid(task.result()):
+                        won = task is not primary
+                        self.wins += won
+                        if metrics is not None and hedge_slot is not None:
+                            metrics.inc("hedges_total", outcome="won" if won else "lost")
+                        return task.result(), tasks[task], hedge_slot is not None
+                    fallback = fallback or (task.result(), tasks[task])
+            if fallback is not None:
+                return fallback[0], fallback[1], hedge_slot is not None
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            if hedge_slot is not None:
+                hedge_slot.in_flight -= 1
+            if holds_slot:
+                hedge_slot.slots.release()
+
+    def stats(self):
+        return {"requests": self.requests, "hedges": self.hedges, "wins": self.wins,
+                "threshold": self.threshold()}
@@ -0,0 +1,154 @@
+import re
+import json
+
+# === Repair Labels ===
+CODE_FENCE = "code_fence"
+TRAILING_COMMAS = "trailing_commas"
+CLOSED_TRUNCATED = "closed_truncated"
+DROPPED_PARTIAL = "dropped_partial_value"
+
+_CLOSERS = {"{": "}", "[": "]"}
+BALANCED, TRUNCATED, INVALID = "balanced", "truncated", "invalid"
+_FENCE = "```"
+
+
+def _strip_code_fence(text):
+    start = text.find(_FENCE)
+    if start == -1:
+        return text, False
+    body_start = text.find("\n", start)
+    if body_start == -1:
+        return text, False
+    end = text.find(_FENCE, body_start)
+    return text[body_start + 1:end if end != -1 else len(text)], True
+
+
+def _loads(candidate):
+    try:
+        return json.loads(candidate, strict=False)
+    except ValueError:
+        return None
+
+
+# === Single-Pass Scanner ===
+_STRUCTURAL = re.compile(r'["{}\[\],]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+
+
+def _scan_object(text, start):
+    # Copies text[start:] until the object opened at `start` is balanced, dropping commas
+    # that directly precede a closing bracket. Jumps between structural characters with a
+    # regex instead of stepping through every character. Returns (status, pieces, stack,
+    # in_string, commas, repaired_trailing_commas).
+    out = []
+    stack = []
+    commas = []  # (pieces before the comma, open brackets) for truncation rollback
+    pending_comma = None  # index in `out` of a comma followed only by whitespace so far
+    trailing = False
+    pos = start
+
+    while True:
+        match = _STRUCTURAL.search(text, pos)
+        if match is None:
+            out.append(text[pos:])
+            return TRUNCATED, out, stack, False, commas, trailing
+
+        gap = text[pos:match.start()]
+        if gap:
+            out.append(gap)
+            if gap.strip():
+                pending_comma = None
+        ch = match.group()
+        pos = match.end()
+
+        if ch == '"':
+            end = pos
+            while True:
+                special = _STRING_SPECIAL.search(text, end)
+                if special is None:
+                    out.append(text[match.start():])
+                    return TRUNCATED, out, stack, True, commas, trailing
+                end = special.end()
+                if special.group() == '"':
+                    break
+                end += 1  # skip the escaped character
+            out.append(text[match.start():end])
+            pos = end
+            pending_comma = None
+        elif ch in _CLOSERS:
+            stack.append(_CLOSERS[ch])
+            out.append(ch)
+            pending_comma = None
+        elif ch == ",":
+            commas.append((len(out), list(stack)))
+            pending_comma = len(out)
+            out.append(ch)
+        else:
+            if not stack or stack[-1] != ch:
+                return INVALID, out, stack, False, commas, trailing
+            if pending_comma is not None:
+                out[pending_comma] = ""
+                commas.pop()
+                trailing = True
+                pending_comma = None
+            stack.pop()
+            out.append(ch)
+            if not stack:
+                return BALANCED, out, stack, False, commas, trailing
+
+
+def _close_truncated(pieces, stack, in_string, commas):
+    # First try closing exactly where the text stopped, then roll back to each earlier comma
+    attempts = []
+    head = "".join(pieces) + ('"' if in_string else "")
+    stripped = head.rstrip()
+    if stripped.endswith(":"):
+        stripped += " null"
+    attempts.append((stripped.rstrip(", \t\r\n"), stack, CLOSED_TRUNCATED))
+
+    for count, comma_stack in reversed(commas[-8:]):
+        attempts.append(("".join(pieces[:count]), comma_stack, DROPPED_PARTIAL))
+
+    for head, open_stack, label in attempts:
+        candidate = head + "".join(reversed(open_stack))
+        value = _loads(candidate)
+        if isinstance(value, dict):
+            return value, label
+    return None, None
+
+
+def extract_json(response_text, max_starts=16):
+    # Returns (first JSON object in the response, list of repairs applied), or (None, repairs)
+    if not response_text:
+        return None, []
+
+    text, fenced = _strip_code_fence(response_text)
+    repairs = [CODE_FENCE] if fenced else []
+
+    start = text.find("{")
+    # Fast path: a well-formed response is exactly the span between the outermost braces
+    value = _loads(text[start:text.rfind("}") + 1]) if start != -1 else None
+    if isinstance(value, dict):
+        return value, repairs
+
+    for _ in range(max_starts):
+        if start == -1:
+            break
+        status, output, stack, in_string, commas, trailing = _scan_object(text, start)
+        if status == BALANCED:
+            value = _loads("".join(output))
+            if isinstance(value, dict):
+                return value, repairs + ([TRAILING_COMMAS] if trailing else [])
+        elif status == TRUNCATED:
+            # Ran off the end of the response: the model was cut off mid-object
+            value, label = _close_truncated(output, stack, in_string, commas)
+            if value is not None:
+                return value, repairs + ([TRAILING_COMMAS] if trailing else []) + [label]
+        # Not an object after all (e.g. a brace in leading prose); try the next one
+        start = text.find("{", start + 1)
+
+    if fenced:
+        # The fence may have cut a brace that only appears outside it
+        value, more = extract_json(response_text.replace(_FENCE, ""), max_starts)
+        return value, more
+    return None, repairs
@@ -0,0 +1,205 @@
+import os
+import re
+import json
+import math
+import numpy as np
+from collections import Counter, OrderedDict
+
+# === Tokenizer ===
+_TOKENS = re.compile(r"[a-z0-9]+(?:[-/.:][a-z0-9]+)*")
+_SEPARATORS = re.compile(r"[-/.:]")
+
+
+def tokenize(text):
+    # Lowercase alphanumeric tokens. Codes like "123-45-6789" or "2:22-cv-00114" also
+    # index their parts and the separator-free form, so "6789", "123456789" and the
+    # code as written all hit the same record.
+    tokens = []
+    for match in _TOKENS.findall(text.lower()):
+        tokens.append(match)
+        if _SEPARATORS.search(match):
+            parts = _SEPARATORS.split(match)
+            tokens.extend(parts)
+            tokens.append("".join(parts))
+    return tokens
+
+
+def record_tokens(record):
+    text = record.get("text") or ""
+    content = record.get("metadata", {}).get("content") or ""
+    return tokenize(text if content in text else f"{text} {content}")
+
+
+# === Varint Postings ===
+def encode_postings(rows, tfs):
+    # (row delta, term frequency) pairs as LEB128 varints
+    out = bytearray()
+    previous = 0
+    for row, tf in zip(rows, tfs):
+        for value in (row - previous, tf):
+            while value >= 0x80:
+                out.append((value & 0x7F) | 0x80)
+                value >>= 7
+            out.append(value)
+        previous = row
+    return bytes(out)
+
+
+def decode_varints(buffer):
+    # Vectorized LEB128 decode: every byte < 0x80 ends a value
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    if not len(data):
+        return np.zeros(0, dtype=np.int64)
+    ends = np.flatnonzero(data < 0x80)
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    shift = 7 * (np.arange(len(data)) - np.repeat(starts, ends - starts + 1))
+    return np.add.reduceat((data & 0x7F).astype(np.int64) << shift, starts)
+
+
+def decode_postings(buffer):
+    values = decode_varints(buffer)
+    return np.cumsum(values[0::2]), values[1::2]
+
+
+# === Segments ===
+class _Segment:
+    # lexicon.json  term -> [byte offset, byte length, document frequency]
+    # postings.bin  concatenated varint posting lists
+    # doc_lengths.npy / rows.npy  token count and global row id per document
+
+    def __init__(self, path):
+        with open(os.path.join(path, "lexicon.json"), "r", encoding="utf-8") as f:
+            self.lexicon = json.load(f)
+        self.rows = np.load(os.path.join(path, "rows.npy"))
+        self.doc_lengths = np.load(os.path.join(path, "doc_lengths.npy"))
+        self._postings = open(os.path.join(path, "postings.bin"), "rb")
+
+    def postings(self, term):
+        entry = self.lexicon.get(term)
+        if entry is None:
+            return None
+        offset, length, _ = entry
+        self._postings.seek(offset)
+        return decode_postings(self._postings.read(length))
+
+    @staticmethod
+    def write(path, rows, token_lists):
+        os.makedirs(path, exist_ok=True)
+        index = {}
+        lengths = np.empty(len(rows), dtype=np.int32)
+        for i, (row, tokens) in enumerate(zip(rows, token_lists)):
+            lengths[i] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                index.setdefault(term, ([], []))
+                index[term][0].append(int(row))
+                index[term][1].append(tf)
+
+        lexicon = {}
+        with open(os.path.join(path, "postings.bin"), "wb") as f:
+            for term in sorted(index):
+                term_rows, tfs = index[term]
+                encoded = encode_postings(term_rows, tfs)
+                lexicon[term] = [f.tell(), len(encoded), len(term_rows)]
+                f.write(encoded)
+        np.save(os.path.join(path, "rows.npy"), np.asarray(rows, dtype=np.int64))
+        np.save(os.path.join(path, "doc_lengths.npy"), lengths)
+        with open(os.path.join(path, "lexicon.json"), "w", encoding="utf-8") as f:
+            json.dump(lexicon, f, separators=(",", ":"))
+
+
+# === BM25 Index ===
+class BM25Index:
+    # On-disk BM25 over insertion records, keyed by the same row ids as VectorIndex.
+    # Each append() writes an immutable segment; filters arrive as a boolean row mask.
+    # remove() records dead rows in removed.npy; they leave the postings, the document
+    # count and the average length, so scores match an index built without them.
+
+    def __init__(self, path, k1=1.2, b=0.75, cache_terms=4096):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        os.makedirs(path, exist_ok=True)
+        self.segments = [
+            _Segment(os.path.join(path, name))
+            for name in sorted(os.listdir(path)) if name.startswith("segment_")
+        ]
+        self._cache = OrderedDict()  # term -> (rows, tfs) across segments
+        self._cache_terms = cache_terms
+        removed_path = os.path.join(path, "removed.npy")
+        self.removed = np.load(removed_path) if os.path.exists(removed_path) else np.zeros(0, dtype=np.int64)
+        self._refresh_stats()
+
+    def _refresh_stats(self):
+        lengths = [s.doc_lengths for s in self.segments]
+        rows = [s.rows for s in self.segments]
+        size = int(max((r.max() for r in rows if len(r)), default=-1)) + 1
+        self.doc_lengths = np.zeros(size, dtype=np.float32)
+        self.live = np.zeros(size, dtype=bool)
+        for r, lens in zip(rows, lengths):
+            self.doc_lengths[r] = lens
+            self.live[r] = True
+        self.live[self.removed[self.removed < size]] = False
+        self.doc_count = int(self.live.sum())
+        total = float(self.doc_lengths[self.live].sum())
+        self.avg_length = total / self.doc_count if self.doc_count else 0.0
+
+    def append(self, rows, records):
+        segment_path = os.path.join(self.path, f"segment_{len(self.segments):05d}")
+        _Segment.write(segment_path, rows, [record_tokens(r) for r in records])
+        self.segments.append(_Segment(segment_path))
+        self._cache.clear()
+        self._refresh_stats()
+
+    def remove(self, rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(rows):
+            return
+        self.removed = np.union1d(self.removed, rows)
+        np.save(os.path.join(self.path, "removed.npy"), self.removed)
+        self._cache.clear()
+        self._refresh_stats()
+
+    def _term_postings(self, term):
+        cached = self._cache.get(term)
+        if cached is not None:
+            self._cache.move_to_end(term)
+            return cached
+        parts = [p for p in (s.postings(term) for s in self.segments) if p is not None]
+        if parts:
+            rows, tfs = np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+            keep = self.live[rows]
+            postings = (rows[keep], tfs[keep])
+        else:
+            postings = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+        self._cache[term] = postings
+        if len(self._cache) > self._cache_terms:
+            self._cache.popitem(last=False)
+        return postings
+
+    def score(self, query, mask=None):
+        # BM25 score of every matching row: returns (rows, scores), rows ascending
+        all_rows, all_scores = [], []
+        for term in set(tokenize(query)):
+            rows, tfs = self._term_postings(term)
+            df = len(rows)
+            if mask is not None and len(rows):
+                keep = mask[rows]
+                rows, tfs = rows[keep], tfs[keep]
+            if not len(rows):
+                continue
+            idf = math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[rows] / self.avg_length)
+            all_rows.append(rows)
+            all_scores.append(idf * tfs * (self.k1 + 1) / (tfs + norm))
+        if not all_rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        rows, inverse = np.unique(np.concatenate(all_rows), return_inverse=True)
+        return rows, np.bincount(inverse, weights=np.concatenate(all_scores)).astype(np.float32)
+
+    def search(self, query, k=5, mask=None):
+        rows, scores = self.score(query, mask)
+        if len(rows) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[top], scores[top]
+        order = np.argsort(-scores)
+        return rows[order], scores[order]
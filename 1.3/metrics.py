@@ -0,0 +1,189 @@
+import os
+import json
+import time
+import bisect
+import contextvars
+from contextlib import contextmanager
+
+# Seconds; wide enough for a JSON parse (ms) and a slow model call (minutes)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+
+# === Histogram ===
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation (like histogram_quantile)
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], self.counts)),
+        }
+
+
+# === Registry ===
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class MetricsRegistry:
+    # Counters, gauges and histograms keyed by (name, labels). Everything runs on the
+    # event loop thread, so there is no locking. write() exports Prometheus text for a
+    # .prom path and a JSON snapshot otherwise; the file is swapped in atomically so a
+    # scraper (node_exporter textfile collector, a tail -f) never reads half a file.
+    # Inside scope(), values are also recorded in a registry of their own, so one of several
+    # jobs sharing the process can report its own numbers.
+
+    def __init__(self, prefix="summarize"):
+        self.prefix = prefix
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.help = {}
+        self.started = time.time()
+        self._scope = contextvars.ContextVar(f"{prefix}_metrics_scope", default=None)
+
+    @contextmanager
+    def scope(self):
+        # Yields a fresh registry that also receives everything recorded here from this
+        # context and the tasks it starts; the process-wide totals are unaffected
+        scoped = MetricsRegistry(self.prefix)
+        token = self._scope.set(scoped)
+        try:
+            yield scoped
+        finally:
+            self._scope.reset(token)
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        self.counters[key] = self.counters.get(key, 0) + value
+        scoped = self._scope.get()
+        if scoped is not None:
+            scoped.inc(name, value, **labels)
+
+    def set(self, name, value, **labels):
+        self.gauges[(name, _label_key(labels))] = value
+        scoped = self._scope.get()
+        if scoped is not None:
+            scoped.set(name, value, **labels)
+
+    def add(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        self.gauges[key] = self.gauges.get(key, 0) + value
+        scoped = self._scope.get()
+        if scoped is not None:
+            scoped.add(name, value, **labels)
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(value)
+        scoped = self._scope.get()
+        if scoped is not None:
+            scoped.observe(name, value, **labels)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def counter_value(self, name, **labels):
+        if labels:
+            return self.counters.get((name, _label_key(labels)), 0)
+        return sum(v for (n, _), v in self.counters.items() if n == name)
+
+    # === Export ===
+    def snapshot(self):
+        def rows(metrics, render):
+            out = {}
+            for (name, labels), value in sorted(metrics.items()):
+                out.setdefault(name, []).append({"labels": dict(labels), **render(value)})
+            return out
+
+        return {
+            "timestamp": time.time(),
+            "uptime_seconds": round(time.time() - self.started, 3),
+            "counters": rows(self.counters, lambda v: {"value": v}),
+            "gauges": rows(self.gauges, lambda v: {"value": v}),
+            "histograms": rows(self.histograms, Histogram.snapshot),
+        }
+
+    def to_prometheus(self):
+        lines = []
+
+        def labels_text(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+        def header(name, kind, seen):
+            full = f"{self.prefix}_{name}"
+            if name not in seen:
+                seen.add(name)
+                if name in self.help:
+                    lines.append(f"# HELP {full} {self.help[name]}")
+                lines.append(f"# TYPE {full} {kind}")
+            return full
+
+        for metrics, kind in ((self.counters, "counter"), (self.gauges, "gauge")):
+            seen = set()
+            for (name, labels), value in sorted(metrics.items()):
+                full = header(name, kind, seen)
+                lines.append(f"{full}{labels_text(labels)} {value}")
+
+        seen = set()
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            full = header(name, "histogram", seen)
+            cumulative = 0
+            for bound, n in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+                cumulative += n
+                lines.append(f"{full}_bucket{labels_text(labels, [('le', str(bound))])} {cumulative}")
+            lines.append(f"{full}_sum{labels_text(labels)} {histogram.sum:.6f}")
+            lines.append(f"{full}_count{labels_text(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            if path.endswith(".prom"):
+                f.write(self.to_prometheus())
+            else:
+                json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp_path, path)
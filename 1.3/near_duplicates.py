@@ -0,0 +1,142 @@
+import os
+import re
+import json
+import hashlib
+
+# === SimHash Fingerprints ===
+FINGERPRINT_BITS = 64
+_WORDS = re.compile(r"[a-z0-9]+")
+_NUMBERS = re.compile(r"\d+")
+
+
+def shingles(text, size=3):
+    words = _WORDS.findall(text.lower())
+    return [" ".join(words[i:i + size]) for i in range(max(0, len(words) - size + 1))]
+
+
+def simhash(features):
+    # Bit i of the fingerprint is set when most feature hashes have bit i set;
+    # columns of the hashes' bit strings are counted with zip instead of a per-bit loop.
+    if not features:
+        return 0
+    bit_strings = [
+        format(int.from_bytes(hashlib.blake2b(f.encode("utf-8"), digest_size=8).digest(), "big"), "064b")
+        for f in features
+    ]
+    majority = len(bit_strings) / 2
+    fingerprint = 0
+    for column in zip(*bit_strings):
+        fingerprint = (fingerprint << 1) | (column.count("1") > majority)
+    return fingerprint
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def numbers_digest(text):
+    # Two pages that differ only in a date, dose or amount are NOT duplicates: their
+    # extractions differ exactly where it matters, however close the SimHash is.
+    numbers = sorted(set(_NUMBERS.findall(text)))
+    return hashlib.blake2b(" ".join(numbers).encode("utf-8"), digest_size=8).hexdigest()
+
+
+# === Band Index ===
+class NearDuplicateIndex:
+    # Fingerprints are split into `bands` equal bands; two fingerprints within
+    # max_distance < bands bits must agree on at least one band, so only pages
+    # sharing a band bucket are compared.
+
+    def __init__(self, max_distance=3, bands=4, min_shingles=20, version=None):
+        if max_distance >= bands:
+            raise ValueError("max_distance must be smaller than the number of bands")
+        self.max_distance = max_distance
+        self.bands = bands
+        self.band_bits = FINGERPRINT_BITS // bands
+        self.min_shingles = min_shingles
+        # Hash of the model/prompt/schema the stored contents came from; saved entries of
+        # another version are not loaded, so a changed extraction is never copied from them
+        self.version = version
+        self.entries = {}  # (file_name, page_number) -> {"fingerprint", "digest", "content"}
+        self._buckets = [{} for _ in range(bands)]
+
+    def fingerprint(self, text):
+        # Returns (simhash, numbers digest), or None for too little text to tell a duplicate from a coincidence
+        features = shingles(text)
+        if len(features) < self.min_shingles:
+            return None
+        return simhash(features), numbers_digest(text)
+
+    def _band_keys(self, fingerprint):
+        mask = (1 << self.band_bits) - 1
+        return [(fingerprint >> (i * self.band_bits)) & mask for i in range(self.bands)]
+
+    def find(self, fingerprint, exclude=None):
+        # Closest entry within max_distance; `exclude` is the page's own key, whose entry
+        # from an earlier run of the same file is not a duplicate of it
+        fingerprint, digest = fingerprint
+        best, best_distance = None, None
+        seen = {exclude}
+        for band, key in enumerate(self._band_keys(fingerprint)):
+            for entry_key in self._buckets[band].get(key, ()):
+                if entry_key in seen:
+                    continue
+                seen.add(entry_key)
+                entry = self.entries[entry_key]
+                if entry["digest"] != digest:
+                    continue
+                distance = hamming(fingerprint, entry["fingerprint"])
+                if distance <= self.max_distance and (best_distance is None or distance < best_distance):
+                    best, best_distance = entry_key, distance
+        return best
+
+    def add(self, entry_key, fingerprint, content=None):
+        self.remove(entry_key)
+        fingerprint, digest = fingerprint
+        self.entries[entry_key] = {"fingerprint": fingerprint, "digest": digest, "content": content}
+        for band, key in enumerate(self._band_keys(fingerprint)):
+            self._buckets[band].setdefault(key, []).append(entry_key)
+
+    def set_content(self, entry_key, content):
+        if entry_key in self.entries:
+            self.entries[entry_key]["content"] = content
+
+    def remove(self, entry_key):
+        entry = self.entries.pop(entry_key, None)
+        if entry is None:
+            return
+        for band, key in enumerate(self._band_keys(entry["fingerprint"])):
+            bucket = self._buckets[band].get(key, [])
+            if entry_key in bucket:
+                bucket.remove(entry_key)
+
+    # === Persistence (one index per client, reused across uploads) ===
+    @classmethod
+    def load(cls, path, **kwargs):
+        index = cls(**kwargs)
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        row = json.loads(line)
+                        if row.get("version") != index.version:
+                            continue
+                        fingerprint = (int(row["fingerprint"], 16), row["digest"])
+                        index.add((row["file_name"], row["page_number"]), fingerprint, row["content"])
+        return index
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for (file_name, page_number), entry in self.entries.items():
+                if entry["content"] is None:
+                    continue
+                f.write(json.dumps({
+                    "file_name": file_name,
+                    "page_number": page_number,
+                    "fingerprint": f"{entry['fingerprint']:016x}",
+                    "digest": entry["digest"],
+                    "version": self.version,
+                    "content": entry["content"],
+                }, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, path)
@@ -0,0 +1,188 @@
+from typing import NamedTuple
+
+# === Work Units ===
+class WorkUnit(NamedTuple):
+    pages: tuple  # PageBlocks covered by this request
+    text: str     # text sent to the model
+    part: int     # 1-based part index when a single page was split, else 0
+    parts: int    # total parts of the split page, else 0
+    group: object = None  # pages are only packed with pages of the same group (e.g. model tier) and file
+
+    @property
+    def page_numbers(self):
+        return [page.page_number for page in self.pages]
+
+
+# === Oversize Splitting ===
+def split_text(text, max_chars):
+    # Prefer paragraph breaks, then line breaks, then a hard cut
+    parts = []
+    while len(text) > max_chars:
+        window = text[:max_chars]
+        cut = window.rfind("\n\n")
+        if cut < max_chars // 2:
+            cut = window.rfind("\n")
+        if cut < max_chars // 2:
+            cut = max_chars
+        parts.append(text[:cut])
+        text = text[cut:].lstrip("\n")
+    if text.strip() or not parts:
+        parts.append(text)
+    return parts
+
+
+# === Packing ===
+class PagePacker:
+    # Packing state: consecutive small pages of one file share one request up to max_chars,
+    # pages larger than max_chars are split into several single-page parts. add() and
+    # flush() return the WorkUnits that are complete.
+
+    def __init__(self, max_chars, max_pages_per_unit=4, group_of=None):
+        self.max_chars = max_chars
+        self.max_pages_per_unit = max_pages_per_unit
+        self.group_of = group_of
+        self.batch = []
+        self.batch_chars = 0
+        self.batch_group = None
+
+    def flush(self):
+        units = []
+        if self.batch:
+            units.append(WorkUnit(tuple(self.batch), "\n\n".join(page.text for page in self.batch), 0, 0, self.batch_group))
+        self.batch = []
+        self.batch_chars = 0
+        return units
+
+    def add(self, page):
+        size = len(page.text)
+        group = self.group_of(page) if self.group_of else None
+        if size > self.max_chars:
+            units = self.flush()
+            chunks = split_text(page.text, self.max_chars)
+            if len(chunks) == 1:
+                return units + [WorkUnit((page,), page.text, 0, 0, group)]
+            return units + [WorkUnit((page,), chunk, index, len(chunks), group)
+                            for index, chunk in enumerate(chunks, start=1)]
+
+        units = []
+        if self.batch and (self.batch_chars + size > self.max_chars or len(self.batch) >= self.max_pages_per_unit
+                           or group != self.batch_group or page.file_name != self.batch[-1].file_name):
+            units = self.flush()
+        self.batch_group = group
+        self.batch.append(page)
+        self.batch_chars += size
+        return units
+
+
+def pack_pages(pages, max_chars, max_pages_per_unit=4, group_of=None):
+    # Streams WorkUnits off an iterable of pages, or off an async iterable as an async generator
+    packer = PagePacker(max_chars, max_pages_per_unit, group_of)
+    if hasattr(pages, "__aiter__"):
+        return _pack_async(pages, packer)
+    return _pack(pages, packer)
+
+
+def _pack(pages, packer):
+    for page in pages:
+        yield from packer.add(page)
+    yield from packer.flush()
+
+
+async def _pack_async(pages, packer):
+    async for page in pages:
+        for unit in packer.add(page):
+            yield unit
+    for unit in packer.flush():
+        yield unit
+
+
+# === Mapping Responses Back to Pages ===
+def split_multi_page_result(json_result, page_numbers):
+    # A packed request answers {"pages": [{...page_number...}, ...]}; returns {page_number: content}
+    if isinstance(json_result, dict) and isinstance(json_result.get("pages"), list):
+        entries = [entry for entry in json_result["pages"] if isinstance(entry, dict)]
+    elif isinstance(json_result, list):
+        entries = [entry for entry in json_result if isinstance(entry, dict)]
+    elif isinstance(json_result, dict) and len(page_numbers) == 1:
+        entries = [json_result]
+    else:
+        entries = []
+
+    by_page = {}
+    for entry in entries:
+        try:
+            by_page.setdefault(int(entry.get("page_number")), entry)
+        except (TypeError, ValueError):
+            continue
+
+    # Fall back to response order when the model dropped or garbled page numbers
+    if not set(page_numbers) <= set(by_page) and len(entries) == len(page_numbers):
+        by_page = dict(zip(page_numbers, entries))
+
+    return {n: by_page.get(n) for n in page_numbers}
+
+
+def merge_partial_results(left, right):
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if isinstance(left, dict) and isinstance(right, dict):
+        merged = dict(left)
+        for key, value in right.items():
+            merged[key] = merge_partial_results(left.get(key), value)
+        return merged
+    if isinstance(left, list) and isinstance(right, list):
+        return left + [item for item in right if item not in left]
+    if isinstance(left, str) and isinstance(right, str):
+        if right in left:
+            return left
+        if left in right:
+            return right
+        return f"{left}; {right}"
+    return left
+
+
+def _has_values(obj):
+    if isinstance(obj, dict):
+        return any(_has_values(v) for v in obj.values())
+    if isinstance(obj, list):
+        return any(_has_values(v) for v in obj)
+    return obj not in (None, "")
+
+
+class SplitPageAssembler:
+    # Collects the per-part results of split pages and merges them once every part is in
+    def __init__(self):
+        self._pending = {}
+
+    def add(self, record, part, parts):
+        key = (record["file_name"], record["page_number"])
+        received = self._pending.setdefault(key, {})
+        received[part] = record
+        if len(received) < parts:
+            return None
+        del self._pending[key]
+
+        ordered = [received[i] for i in sorted(received)]
+        errors = [r["content"]["error"] for r in ordered if "error" in r["content"]]
+        merged = dict(ordered[0])
+        merged["duration"] = round(sum(r["duration"] for r in ordered), 2)
+        merged["prompt_tokens"] = sum(r.get("prompt_tokens", 0) for r in ordered)
+        merged["completion_tokens"] = sum(r.get("completion_tokens", 0) for r in ordered)
+        merged["cached"] = all(r.get("cached") for r in ordered)
+        merged["parts"] = parts
+
+        if errors:
+            merged["content"] = {"error": f"{len(errors)}/{parts} parts failed: {errors[0]}"}
+            return merged
+
+        content = None
+        for r in ordered:
+            part_content = r["content"]
+            if isinstance(part_content.get("MedicalVisits"), list):
+                part_content = dict(part_content)
+                part_content["MedicalVisits"] = [v for v in part_content["MedicalVisits"] if _has_values(v)]
+            content = merge_partial_results(content, part_content)
+        merged["content"] = content
+        return merged
@@ -0,0 +1,184 @@
+import os
+import re
+import json
+import mmap
+from typing import NamedTuple
+
+# === Page Blocks ===
+MARKER_PATTERN = re.compile(rb"=== (START|END) OF PAGE (\d+) ON PDF (.+?) ===")
+
+
+class PageMarkerError(ValueError):
+    pass
+
+
+class PageBlock(NamedTuple):
+    page_number: int
+    file_name: str
+    text: str
+    offset: int  # byte offset of the START marker in the source file
+    length: int  # byte length of the block including both markers
+
+
+def _describe(kind, page, file_name, offset):
+    return f"{kind} marker for page {page} on {file_name} at byte {offset}"
+
+
+# === Streaming Splitter ===
+def iter_page_blocks(path, strict=False, on_problem=None):
+    # Walks START/END markers over an mmap of the file and yields each page as soon as
+    # its END marker is seen. Unclosed, orphaned or mismatched markers are reported and
+    # the affected block is skipped (or PageMarkerError is raised when strict=True).
+    def problem(message):
+        if strict:
+            raise PageMarkerError(message)
+        if on_problem is not None:
+            on_problem(message)
+        else:
+            print(f"⚠️ {message}")
+
+    if os.path.getsize(path) == 0:
+        return
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        open_marker = None  # (page, file_name, start_offset)
+
+        for match in MARKER_PATTERN.finditer(mm):
+            kind = match.group(1)
+            page = int(match.group(2))
+            file_name = match.group(3).decode("utf-8", errors="replace")
+
+            if kind == b"START":
+                if open_marker is not None:
+                    problem(f"{_describe('START', *open_marker)} has no END before the next START")
+                open_marker = (page, file_name, match.start())
+                continue
+
+            if open_marker is None:
+                problem(f"{_describe('END', page, file_name, match.start())} has no matching START")
+                continue
+
+            start_page, start_file, start_offset = open_marker
+            open_marker = None
+            if (start_page, start_file) != (page, file_name):
+                problem(f"{_describe('START', start_page, start_file, start_offset)} is closed by "
+                        f"{_describe('END', page, file_name, match.start())}")
+                continue
+
+            block = mm[start_offset:match.end()]
+            yield PageBlock(page, file_name, block.decode("utf-8", errors="replace"), start_offset, len(block))
+
+        if open_marker is not None:
+            problem(f"{_describe('START', *open_marker)} has no END before end of file")
+
+
+# === Page Index ===
+def page_index_path(text_path, index_dir=None):
+    # <text_path>.pages.json, or the same file name under index_dir
+    path = f"{text_path}.pages.json"
+    return path if index_dir is None else os.path.join(index_dir, os.path.basename(path))
+
+
+class PageIndex:
+    # Sidecar of (file_name, page_number) -> (offset, length) for one extracted text file,
+    # written while the pipeline splits it. page_text() slices one page off an mmap, so a
+    # citation is shown without scanning the file. The index records the file's size and
+    # mtime; load() rebuilds it when the text file has changed since. The sidecar sits
+    # beside the text file unless index_dir is given; saving it is best-effort.
+
+    def __init__(self, text_path, entries, size=None, mtime_ns=None, index_dir=None):
+        self.text_path = text_path
+        self.entries = entries  # {(file_name, page_number): (offset, length)}
+        self.index_dir = index_dir
+        stat = os.stat(text_path)
+        self.size = stat.st_size if size is None else size
+        self.mtime_ns = stat.st_mtime_ns if mtime_ns is None else mtime_ns
+        self._file = None
+        self._mm = None
+
+    @classmethod
+    def build(cls, text_path, index_dir=None):
+        blocks = iter_page_blocks(text_path, on_problem=lambda message: None)
+        return cls(text_path, {(b.file_name, b.page_number): (b.offset, b.length) for b in blocks},
+                   index_dir=index_dir)
+
+    @classmethod
+    def load(cls, text_path, index_dir=None):
+        try:
+            with open(page_index_path(text_path, index_dir), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            stat = os.stat(text_path)
+            if (data["size"], data["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+                entries = {
+                    (file_name, int(page)): tuple(span)
+                    for file_name, pages in data["pages"].items() for page, span in pages.items()
+                }
+                return cls(text_path, entries, data["size"], data["mtime_ns"], index_dir)
+        except (OSError, ValueError, KeyError):
+            pass
+        index = cls.build(text_path, index_dir)
+        index.save()
+        return index
+
+    def save(self):
+        # False (with a warning) when the sidecar cannot be written; lookups rebuild it then
+        pages = {}
+        for (file_name, page), span in sorted(self.entries.items()):
+            pages.setdefault(file_name, {})[str(page)] = list(span)
+        path = page_index_path(self.text_path, self.index_dir)
+        tmp_path = f"{path}.tmp"
+        try:
+            if self.index_dir is not None:
+                os.makedirs(self.index_dir, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"source": os.path.basename(self.text_path), "size": self.size,
+                           "mtime_ns": self.mtime_ns, "pages": pages}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ Page index not saved to {path}: {e}")
+            return False
+        return True
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def lookup(self, file_name, page_number):
+        return self.entries.get((file_name, page_number))
+
+    def page_text(self, file_name, page_number, markers=False):
+        # The page's text, or None if the index has no such page
+        span = self.lookup(file_name, page_number)
+        if span is None:
+            return None
+        if self._mm is None:
+            self._file = open(self.text_path, "rb")
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        offset, length = span
+        text = self._mm[offset:offset + length].decode("utf-8", errors="replace")
+        return text if markers else _strip_page_markers(text)
+
+    def cited_text(self, citation):
+        # {"file": ..., "pages": [...]} from an insertion record -> [(page_number, text)]
+        return [(page, self.page_text(citation["file"], page)) for page in citation["pages"]
+                if (citation["file"], page) in self.entries]
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._file.close()
+            self._mm = self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _strip_page_markers(text):
+    lines = text.split("\n")
+    if lines and lines[0].startswith("=== START OF PAGE"):
+        lines = lines[1:]
+    if lines and lines[-1].startswith("=== END OF PAGE"):
+        lines = lines[:-1]
+    return "\n".join(lines).strip("\n")
@@ -0,0 +1,148 @@
+import re
+from typing import NamedTuple
+
+# === Tiers ===
+SKIP = "skip"
+CHEAP = "cheap"
+FULL = "full"
+
+# === Section Keywords ===
+# Stems per json_template section; matched as word prefixes, case-insensitive
+SECTION_KEYWORDS = {
+    "Clients": ["client", "claimant", "patient", "name", "re:"],
+    "PersonalIdentifyingInformation": [
+        "date of birth", "dob", "birth", "ssn", "social security", "address", "phone",
+        "telephone", "email", "e-mail", "street", "zip"
+    ],
+    "MedicalHistory": [
+        "diagnos", "treatment", "medication", "prescri", "mg", "allerg", "surger", "surgical",
+        "hospital", "physician", "doctor", "dr.", "m.d", "therap", "lab", "mri", "x-ray", "ct scan",
+        "imaging", "psychiatr", "psycholog", "depress", "anxiety", "pain", "chronic", "functional",
+        "neuropathy", "impairment", "symptom", "icd", "evaluation", "assessment"
+    ],
+    "MedicalVisits": [
+        "visit", "appointment", "seen", "exam", "clinic", "office", "follow-up", "follow up",
+        "chief complaint", "history of present illness", "recommend", "plan", "progress note"
+    ],
+    "WorkHistory": [
+        "employ", "job", "occupation", "work", "hired", "terminat", "resign", "supervisor",
+        "coworker", "colleague", "duties", "position", "shift", "part time", "full time", "wage"
+    ],
+    "FamilyHistory": [
+        "mother", "father", "sister", "brother", "wife", "husband", "spouse", "son", "daughter",
+        "family history", "parent", "sibling"
+    ],
+    "EducationHistory": [
+        "school", "college", "university", "degree", "diploma", "graduat", "ged", "major",
+        "course", "education"
+    ],
+    "LegalHistory": [
+        "case no", "case number", "court", "judge", "attorney", "plaintiff", "defendant",
+        "hearing", "appeal", "docket", "alj", "claim"
+    ],
+    "FinancialInformation": [
+        "income", "salary", "bank", "account", "tax", "asset", "liabilit", "expense", "benefit",
+        "payment", "debt", "$"
+    ],
+}
+
+_SECTION_PATTERNS = {
+    section: re.compile(
+        "|".join(r"(?<![a-z])" + re.escape(keyword) + (r"" if not keyword[-1].isalpha() else r"\w*")
+                 for keyword in keywords)
+    )
+    for section, keywords in SECTION_KEYWORDS.items()
+}
+
+# Strong structured signals count extra towards the sections they fill
+_SIGNALS = {
+    "PersonalIdentifyingInformation": re.compile(
+        r"\b\d{3}-\d{2}-\d{4}\b|\(\d{3}\)\s*\d{3}-\d{4}|\b\d{3}[-.]\d{3}[-.]\d{4}\b|[\w.+-]+@[\w-]+\.[\w.]+"
+    ),
+    "MedicalVisits": re.compile(r"\b\d{1,2}/\d{1,2}/\d{2,4}\b|\b(?:19|20)\d{2}-\d{2}-\d{2}\b"),
+    "FinancialInformation": re.compile(r"\$\s?\d[\d,]*(?:\.\d{2})?"),
+}
+
+_NOISE_LINES = re.compile(
+    r"^(?:=== (?:START|END) OF PAGE .*===|--- [A-Z ]+ ---|\[(?:TrOCR|EasyOCR)[^\]]*\]|\[OCR (?:ERROR|FAILURE)\].*|Page \d+)\s*$",
+    re.MULTILINE
+)
+_LEFT_BLANK = re.compile(r"intentionally\s+(?:been\s+)?left\s+blank|this page (?:is|was) blank", re.IGNORECASE)
+_FAX_COVER = re.compile(
+    r"\bfax\b|facsimile|cover sheet|transmittal|pages? \(?including cover|confidentiality notice|"
+    r"if you (?:have )?received this (?:fax|transmission) in error", re.IGNORECASE
+)
+
+
+class TriageDecision(NamedTuple):
+    tier: str
+    reason: str
+    score: float
+    section_scores: dict
+
+
+def page_body(page_text):
+    # Page text minus markers, extractor headers and OCR engine tags
+    return _NOISE_LINES.sub("", page_text).strip()
+
+
+def score_sections(body, keyword_cap=10):
+    lowered = body.lower()
+    scores = {}
+    for section, pattern in _SECTION_PATTERNS.items():
+        hits = min(keyword_cap, len(pattern.findall(lowered)))
+        signal = _SIGNALS.get(section)
+        if signal is not None:
+            hits += 2 * min(keyword_cap, len(signal.findall(body)))
+        scores[section] = hits
+    return scores
+
+
+# === Section Routing ===
+class SectionRouter:
+    # Picks the json_template sections a page is likely to fill from the same keyword
+    # scores triage uses; the rest are filled with nulls instead of asked for. Clients
+    # is always asked: the model names the client on almost every page.
+
+    def __init__(self, min_hits=1, always=("Clients",)):
+        self.min_hits = min_hits
+        self.always = set(always)
+
+    def route(self, page_text):
+        scores = score_sections(page_body(page_text))
+        return {section for section, hits in scores.items() if hits >= self.min_hits or section in self.always}
+
+    def route_pages(self, pages):
+        # Sections for one request: every section any of its pages is likely to fill
+        routed = set().union(*(self.route(page.text) for page in pages))
+        return tuple(section for section in SECTION_KEYWORDS if section in routed)
+
+
+# === Classifier ===
+class PageTriage:
+    # skip: nothing worth extracting (blank, "intentionally left blank", fax covers);
+    # cheap: a few weak signals, sent to a smaller model; full: everything else.
+
+    def __init__(self, min_chars=40, full_score=8, fax_max_chars=1500):
+        self.min_chars = min_chars
+        self.full_score = full_score
+        self.fax_max_chars = fax_max_chars
+
+    def classify(self, page_text):
+        body = page_body(page_text)
+        content_chars = sum(ch.isalnum() for ch in body)
+        if content_chars < self.min_chars:
+            return TriageDecision(SKIP, "blank", 0.0, {})
+
+        section_scores = score_sections(body)
+        score = float(sum(section_scores.values()))
+        # Identity/date signals alone (letterheads, cover pages) are not enough to keep a page
+        substantive = score - section_scores["Clients"] - section_scores["MedicalVisits"]
+
+        if _LEFT_BLANK.search(body) and content_chars < 400:
+            return TriageDecision(SKIP, "left_blank", score, section_scores)
+        if len(_FAX_COVER.findall(body)) >= 2 and content_chars < self.fax_max_chars and substantive < 4:
+            return TriageDecision(SKIP, "fax_cover", score, section_scores)
+        if score < self.full_score:
+            return TriageDecision(CHEAP, "low_signal", score, section_scores)
+        return TriageDecision(FULL, "signal", score, section_scores)
@@ -0,0 +1,192 @@
+import io
+import os
+import time
+import asyncio
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from pdfminer.converter import TextConverter
+from pdfminer.layout import LAParams
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdftypes import resolve1
+
+from page_splitter import PageBlock, PageIndex
+
+
+# === Page Markers ===
+def format_page_block(page_number, file_name, embedded_text):
+    # Same layout the OCR notebook writes, minus its OCR TEXT section
+    return (f"=== START OF PAGE {page_number} ON PDF {file_name} ===\n"
+            f"--- EMBEDDED TEXT ---\n{embedded_text}\n"
+            f"=== END OF PAGE {page_number} ON PDF {file_name} ===\n")
+
+
+# === Worker Functions (run in the process pool) ===
+def page_count(pdf_path):
+    # 0 for a PDF that cannot be parsed; it is reported and left out
+    try:
+        with open(pdf_path, "rb") as f:
+            document = PDFDocument(PDFParser(f))
+            pages = resolve1(document.catalog.get("Pages"))
+            count = resolve1(pages.get("Count")) if isinstance(pages, dict) else None
+            if isinstance(count, int):
+                return count, None
+            return sum(1 for _ in PDFPage.create_pages(document)), None
+    except Exception as e:
+        return 0, f"{type(e).__name__}: {e}"
+
+
+def extract_page_range(pdf_path, first, last):
+    # ([(page_number, embedded text)], error) for pages first..last (1-based, inclusive);
+    # one stripped line per text line, blank lines dropped, like the notebook's HTML pass.
+    # Pages of a range that fails come back empty, so triage skips them as blank.
+    pages = []
+    resources = PDFResourceManager()
+    laparams = LAParams()
+    try:
+        with open(pdf_path, "rb") as f:
+            for index, page in enumerate(PDFPage.get_pages(f, pagenos=range(first - 1, last)), start=first):
+                output = io.StringIO()
+                device = TextConverter(resources, output, laparams=laparams)
+                try:
+                    PDFPageInterpreter(resources, device).process_page(page)
+                finally:
+                    device.close()
+                lines = [line.strip() for line in output.getvalue().splitlines()]
+                pages.append((index, "\n".join(line for line in lines if line)))
+    except Exception as e:
+        done = {page_number for page_number, _ in pages}
+        pages.extend((n, "") for n in range(first, last + 1) if n not in done)
+        return pages, f"{type(e).__name__}: {e}"
+    return pages, None
+
+
+# === Parallel Extraction ===
+class PdfTextExtractor:
+    # Pulls embedded text out of a batch of PDFs on a process pool. Each PDF is cut into
+    # ranges of pages_per_task pages; at most `window` ranges are in flight, so the pool
+    # works ahead of the consumer without holding a whole batch of text in memory.
+    # Pages come out in document and page order and are written to <text_dir>/<stem>.txt
+    # in the page marker format (with its page index, under index_dir if given) as they
+    # are handed on.
+
+    def __init__(self, workers=None, pages_per_task=4, window=None, index_dir=None):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.index_dir = index_dir
+        self.pages_per_task = max(1, pages_per_task)
+        self.window = window or 4 * self.workers
+        self.pages = 0
+        self.seconds = 0.0
+
+    def text_path(self, pdf_path, text_dir):
+        return os.path.join(text_dir, os.path.splitext(os.path.basename(pdf_path))[0] + ".txt")
+
+    async def documents(self, pdf_paths, text_dir):
+        # Async generator of (text_path, async page iterator) per PDF, in order; each iterator
+        # must be consumed before the next. Unreadable PDFs get an empty iterator and no text
+        # file. Pool results are awaited, so the event loop keeps serving requests meanwhile.
+        os.makedirs(text_dir, exist_ok=True)
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        pool = ProcessPoolExecutor(self.workers)
+        in_flight = deque()
+        try:
+            counts = []
+            results = await asyncio.gather(*(loop.run_in_executor(pool, page_count, path) for path in pdf_paths))
+            for path, (count, error) in zip(pdf_paths, results):
+                if error:
+                    print(f"⚠️ Skipping {os.path.basename(path)}: {error}")
+                counts.append(count)
+            ranges = (
+                (path, first, min(count, first + self.pages_per_task - 1))
+                for path, count in zip(pdf_paths, counts)
+                for first in range(1, count + 1, self.pages_per_task)
+            )
+
+            def fill():
+                while len(in_flight) < self.window:
+                    task = next(ranges, None)
+                    if task is None:
+                        return
+                    in_flight.append(asyncio.wrap_future(pool.submit(extract_page_range, *task)))
+
+            for path, count in zip(pdf_paths, counts):
+                if not count:
+                    yield self.text_path(path, text_dir), _no_pages()
+                    continue
+                fill()
+                tasks = -(-count // self.pages_per_task)
+                yield self.text_path(path, text_dir), self._write_document(path, tasks, in_flight, fill, text_dir)
+        finally:
+            # A run that stops early drops the queued ranges instead of waiting for them
+            for future in in_flight:
+                future.cancel()
+            pool.shutdown(wait=False, cancel_futures=True)
+            self.seconds += time.perf_counter() - start
+
+    async def _write_document(self, pdf_path, tasks, in_flight, fill, text_dir):
+        file_name = os.path.basename(pdf_path)
+        text_path = self.text_path(pdf_path, text_dir)
+        entries = {}
+        with open(text_path, "wb") as out:
+            for _ in range(tasks):
+                pages, error = await in_flight.popleft()
+                if error:
+                    print(f"⚠️ {file_name} pages {pages[0][0]}-{pages[-1][0]}: {error}")
+                for page_number, text in pages:
+                    block = format_page_block(page_number, file_name, text).encode("utf-8")
+                    offset = out.tell()
+                    out.write(block)
+                    # Flushed so the page index and citation lookups can read it right away
+                    out.flush()
+                    length = len(block) - 1  # without the newline after the END marker
+                    entries[(file_name, page_number)] = (offset, length)
+                    self.pages += 1
+                    yield PageBlock(page_number, file_name, block[:length].decode("utf-8"), offset, length)
+                fill()
+        PageIndex(text_path, entries, index_dir=self.index_dir).save()
+
+    async def _extract(self, pdf_paths, text_dir):
+        paths = []
+        async for text_path, pages in self.documents(pdf_paths, text_dir):
+            count = 0
+            async for _ in pages:
+                count += 1
+            if count:
+                paths.append(text_path)
+        return paths
+
+    def extract(self, pdf_paths, text_dir):
+        # Text files only, without an LLM stage; returns their paths
+        return asyncio.run(self._extract(pdf_paths, text_dir))
+
+
+async def _no_pages():
+    return
+    yield
+
+
+# === CLI ===
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Embedded PDF text in the page marker format, extracted on a process pool")
+    parser.add_argument("--text_dir", required=True, help="Writes <pdf stem>.txt here, one per PDF")
+    parser.add_argument("--workers", type=int, default=None, help="Processes (default: CPU count)")
+    parser.add_argument("--pages_per_task", type=int, default=4)
+    parser.add_argument("pdfs", nargs="+", help="PDF files or directories of PDFs")
+    args = parser.parse_args()
+
+    pdf_paths = []
+    for path in args.pdfs:
+        if os.path.isdir(path):
+            pdf_paths.extend(sorted(os.path.join(path, n) for n in os.listdir(path) if n.lower().endswith(".pdf")))
+        else:
+            pdf_paths.append(path)
+    extractor = PdfTextExtractor(args.workers, args.pages_per_task)
+    written = extractor.extract(pdf_paths, args.text_dir)
+    print(f"✅ {extractor.pages} pages from {len(written)} PDFs in {extractor.seconds:.1f}s "
+          f"({extractor.workers} workers) → {args.text_dir}")
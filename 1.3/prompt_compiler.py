@@ -0,0 +1,65 @@
+import re
+import json
+
+# === Token Estimate ===
+_TOKEN_PIECES = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+
+def estimate_tokens(text):
+    # Local BPE-style estimate: long words cost ~1 token per 4 letters, digits ~1 per 3,
+    # every punctuation/symbol character costs one. Good enough for budgeting and cost tracking.
+    tokens = 0
+    for piece in _TOKEN_PIECES.findall(text):
+        if piece[0].isalpha():
+            tokens += (len(piece) + 3) // 4
+        elif piece[0].isdigit():
+            tokens += (len(piece) + 2) // 3
+        else:
+            tokens += 1
+    return tokens
+
+
+def estimate_message_tokens(messages):
+    # ~4 tokens of chat framing per message
+    return sum(estimate_tokens(m["content"]) + 4 for m in messages)
+
+
+# === Compact Schema ===
+def render_compact_schema(template):
+    return json.dumps(template, separators=(",", ":"))
+
+
+# === Prompt Compiler ===
+INSTRUCTIONS = """You are a disability lawyer reviewing raw text from client documents, extracted with AI-based OCR and PDF tools. The text may contain misspellings or formatting issues.
+
+Extract all structured information relevant to evaluating a disability case: medical history, financial status, legal situations, family context, and anything else that could help establish eligibility or clarify the client's background.
+
+Answer with one JSON object per page in this format, with `null` for missing fields and no commentary:
+{schema}
+
+Always fill the top-level "page_number" and "file_name". When several pages are given, answer {{"pages":[...]}} with one object per page, in page order."""
+
+
+class PromptCompiler:
+    # The instructions and schema are rendered once into a shared system prefix; each
+    # request only adds a short user message with the page text.
+
+    def __init__(self, template):
+        self.template = template
+        self.schema = render_compact_schema(template)
+        self.prefix = INSTRUCTIONS.format(schema=self.schema)
+        # A filled-in page is roughly the size of the schema; used to budget completions
+        self.schema_tokens = estimate_tokens(self.schema)
+
+    def _messages(self, header, text):
+        return [
+            {"role": "system", "content": self.prefix},
+            {"role": "user", "content": f"{header}\n\n{text}"},
+        ]
+
+    def compile_page(self, page_num, file_name, page_text, part_note=""):
+        return self._messages(f"Page {page_num} of {file_name}{part_note}:", page_text)
+
+    def compile_pages(self, page_nums, file_name, pages_text):
+        page_list = ", ".join(str(n) for n in page_nums)
+        return self._messages(f"Pages {page_list} of {file_name}, each between its START/END markers:", pages_text)
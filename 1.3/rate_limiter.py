@@ -0,0 +1,144 @@
+import time
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+
+# === Throttle Detection ===
+THROTTLE_STATUS_CODES = {429, 503}
+
+
+def _parse_retry_after(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_throttle(exc):
+    # Returns (is_throttled, retry_after_seconds) for an exception raised by the API client
+    status_code = getattr(exc, "status_code", None)
+    raw_response = getattr(exc, "raw_response", None) or getattr(exc, "response", None)
+    if status_code is None and raw_response is not None:
+        status_code = getattr(raw_response, "status_code", None)
+
+    if status_code not in THROTTLE_STATUS_CODES:
+        return False, None
+
+    headers = getattr(raw_response, "headers", None) or {}
+    retry_after = _parse_retry_after(headers.get("retry-after") or headers.get("Retry-After"))
+    return True, retry_after
+
+
+# === Per-Key Token Bucket ===
+class KeyRateLimiter:
+    # Two token buckets per API key (requests/min and tokens/min) with AIMD backoff:
+    # every throttle halves the effective rate and pauses the key, every success
+    # recovers a step of the rate until the configured quota is reached again.
+
+    def __init__(self, requests_per_minute, tokens_per_minute=None, min_interval=0.0,
+                 backoff_base=2.0, max_backoff=120.0, min_scale=0.05, recovery_step=0.05,
+                 clock=time.monotonic):
+        self.requests_per_minute = float(requests_per_minute)
+        self.tokens_per_minute = float(tokens_per_minute) if tokens_per_minute else None
+        self.min_interval = float(min_interval)
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self.min_scale = min_scale
+        self.recovery_step = recovery_step
+        self.clock = clock
+
+        self.scale = 1.0
+        self.consecutive_throttles = 0
+        self.throttle_count = 0
+        self.paused_until = 0.0
+
+        now = clock()
+        self._request_level = 1.0
+        self._token_level = self.tokens_per_minute or 0.0
+        self._last_refill = now
+        self._next_slot = now
+        self._lock = threading.Lock()
+
+    # === Bucket Accounting ===
+    def _refill(self, now):
+        elapsed = max(0.0, now - self._last_refill)
+        self._last_refill = now
+        request_rate = self.requests_per_minute * self.scale / 60.0
+        self._request_level = min(1.0, self._request_level + elapsed * request_rate)
+        if self.tokens_per_minute:
+            token_rate = self.tokens_per_minute * self.scale / 60.0
+            self._token_level = min(self.tokens_per_minute, self._token_level + elapsed * token_rate)
+
+    def reserve(self, tokens=0):
+        # Books one request of `tokens` and returns how long the caller must wait before sending it.
+        # Levels may go negative; the debt is what later callers queue behind.
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+
+            wait = max(0.0, self.paused_until - now, self._next_slot - now)
+
+            request_rate = self.requests_per_minute * self.scale / 60.0
+            if self._request_level < 1.0:
+                wait = max(wait, (1.0 - self._request_level) / request_rate)
+            self._request_level -= 1.0
+
+            if self.tokens_per_minute and tokens:
+                tokens = min(tokens, self.tokens_per_minute)
+                token_rate = self.tokens_per_minute * self.scale / 60.0
+                if self._token_level < tokens:
+                    wait = max(wait, (tokens - self._token_level) / token_rate)
+                self._token_level -= tokens
+
+            self._next_slot = now + wait + self.min_interval
+            return wait
+
+    def acquire(self, tokens=0):
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens=0):
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    # === Adaptive Feedback ===
+    def record_success(self):
+        with self._lock:
+            self.consecutive_throttles = 0
+            self.scale = min(1.0, self.scale + self.recovery_step)
+
+    def record_throttle(self, retry_after=None):
+        # Returns the pause applied to this key so the caller can retry after it
+        with self._lock:
+            self.throttle_count += 1
+            self.consecutive_throttles += 1
+            self.scale = max(self.min_scale, self.scale / 2.0)
+
+            if retry_after is None:
+                retry_after = min(self.max_backoff, self.backoff_base ** self.consecutive_throttles)
+
+            now = self.clock()
+            self.paused_until = max(self.paused_until, now + retry_after)
+            # Drop any burst credit so the key restarts slowly after the pause
+            self._request_level = min(self._request_level, 0.0)
+            return retry_after
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "requests_per_minute": round(self.requests_per_minute * self.scale, 2),
+                "tokens_per_minute": round(self.tokens_per_minute * self.scale, 2) if self.tokens_per_minute else None,
+                "scale": round(self.scale, 3),
+                "throttle_count": self.throttle_count,
+            }
@@ -0,0 +1,108 @@
+import os
+import json
+
+from page_triage import SKIP
+
+
+# === Live Log Writer ===
+class ResultSink:
+    # Keeps the live log open for the whole run and appends one compact JSON line per
+    # page. flush_every controls how many records may sit in the write buffer; fsync
+    # additionally forces each flush to disk (slower, but survives a power loss).
+
+    def __init__(self, path, flush_every=1, fsync=False):
+        self.path = path
+        self.flush_every = max(1, flush_every)
+        self.fsync = fsync
+        self.written = 0
+        self._unflushed = 0
+        self._file = open(path, "ab")
+        self.offset = self._file.tell()
+
+    def write(self, record):
+        # Returns the record's (start, end) byte span in the log
+        line = json.dumps(record, separators=(",", ":"), ensure_ascii=False).encode("utf-8") + b"\n"
+        self._file.write(line)
+        start = self.offset
+        self.offset += len(line)
+        self.written += 1
+        self._unflushed += 1
+        if self._unflushed >= self.flush_every:
+            self.flush()
+        return start, self.offset
+
+    def flush(self):
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._unflushed = 0
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# === Published Records ===
+class PageSpans:
+    # (file_name, page_number) -> byte span in the live log of the record to publish:
+    # the latest successful record, or the latest error for a page that never succeeded.
+
+    def __init__(self, completed=None):
+        self._spans = {key: (start, end, True) for key, (start, end) in (completed or {}).items()}
+
+    def __contains__(self, key):
+        return key in self._spans
+
+    def update(self, key, span, completed):
+        current = self._spans.get(key)
+        if completed or current is None or not current[2]:
+            self._spans[key] = (span[0], span[1], completed)
+
+    def select(self, keys):
+        return {key: self._spans[key][:2] for key in keys if key in self._spans}
+
+
+# === Final Outputs ===
+def _write_array_item(out_file, record, first):
+    # Matches json.dump(list, indent=2): each element indented one level inside "[ ]"
+    body = json.dumps(record, indent=2).replace("\n", "\n  ")
+    out_file.write(("[\n  " if first else ",\n  ") + body)
+
+
+def write_final_outputs(log_path, output_json, output_stats, spans, on_record=None):
+    # Streams the records at `spans` ({(file_name, page_number): (start, end)}) out of the
+    # live log in page order, one at a time, into the final JSON and the stats file,
+    # handing each to on_record if given. Returns totals for the summary lines.
+    totals = {"pages": 0, "skipped": 0, "duplicates": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    with open(log_path, "rb") as log_file, \
+            open(output_json, "w", encoding="utf-8") as json_file, \
+            open(output_stats, "w", encoding="utf-8") as stats_file:
+        for key in sorted(spans):
+            start, end = spans[key]
+            log_file.seek(start)
+            record = json.loads(log_file.read(end - start))
+            if on_record is not None:
+                on_record(record)
+
+            first = totals["pages"] == 0
+            _write_array_item(json_file, record, first)
+            _write_array_item(stats_file, {k: v for k, v in record.items() if k != "content"}, first)
+
+            totals["pages"] += 1
+            totals["skipped"] += record.get("triage") == SKIP
+            totals["duplicates"] += bool(record.get("duplicate_of"))
+            totals["prompt_tokens"] += record.get("prompt_tokens", 0)
+            totals["completion_tokens"] += record.get("completion_tokens", 0)
+
+        closing = "\n]" if totals["pages"] else "[]"
+        json_file.write(closing)
+        stats_file.write(closing)
+    return totals
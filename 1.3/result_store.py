@@ -0,0 +1,238 @@
+import os
+import json
+import time
+import sqlite3
+
+from checkpoint import iter_live_records
+from consolidation import flatten_response, page_visits, VISITS_SECTION
+
+
+# === Schema ===
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS pages (
+        client_id TEXT NOT NULL,
+        file_name TEXT NOT NULL,
+        page_number INTEGER NOT NULL,
+        stored_at REAL NOT NULL,
+        PRIMARY KEY (client_id, file_name, page_number)
+    ) WITHOUT ROWID;
+
+    -- One row per extracted value. Visits keep their position on the page in `item`,
+    -- so the fields of one visit can be put back together.
+    CREATE TABLE IF NOT EXISTS field_values (
+        client_id TEXT NOT NULL,
+        file_name TEXT NOT NULL,
+        page_number INTEGER NOT NULL,
+        section TEXT NOT NULL,
+        field TEXT NOT NULL,
+        item INTEGER NOT NULL DEFAULT 0,
+        value TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS field_values_client_field ON field_values (client_id, section, field);
+    CREATE INDEX IF NOT EXISTS field_values_field ON field_values (section, field, value);
+    CREATE INDEX IF NOT EXISTS field_values_page ON field_values (client_id, file_name, page_number);
+"""
+
+
+def page_rows(content):
+    # (section, field, item, value) for every non-empty value on one page
+    rows = []
+    for path, values in flatten_response(content).items():
+        section, field = path.split(".", 1)
+        rows.extend((section, field, 0, value) for value in values)
+    for item, visit in enumerate(page_visits(content)):
+        for field, value in visit.items():
+            if value not in (None, "", []):
+                text = value if isinstance(value, str) else json.dumps(value, sort_keys=True)
+                rows.append((VISITS_SECTION, field, item, text))
+    return rows
+
+
+# === Result Store ===
+class ResultStore:
+    # Page results of every client and upload in one SQLite file. Pages are buffered by
+    # add() and written by flush() in one transaction; a page that is stored again
+    # replaces its earlier rows, so re-runs and resumed runs never duplicate values.
+
+    def __init__(self, path, batch_size=500):
+        self.path = path
+        self.batch_size = batch_size
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._pending = {}  # (client_id, file_name, page_number) -> rows
+
+    def add(self, client_id, record):
+        # Buffers one page record; failed pages are ignored so they never wipe stored values
+        content = record.get("content")
+        if not isinstance(content, dict) or "error" in content:
+            return False
+        self._pending[(client_id, record["file_name"], record["page_number"])] = page_rows(content)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+        return True
+
+    def flush(self):
+        if not self._pending:
+            return 0
+        pages = list(self._pending.items())
+        self._pending = {}
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "DELETE FROM field_values WHERE client_id = ? AND file_name = ? AND page_number = ?",
+                [key for key, _ in pages]
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO pages (client_id, file_name, page_number, stored_at) VALUES (?, ?, ?, ?)",
+                [(*key, now) for key, _ in pages]
+            )
+            self.conn.executemany(
+                "INSERT INTO field_values (client_id, file_name, page_number, section, field, item, value) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(*key, *row) for key, rows in pages for row in rows]
+            )
+        return len(pages)
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # === Import ===
+    def import_file(self, path, client_id):
+        # api_results.json, a live JSONL log or final_consolidated_output.json
+        if not path.endswith(".json"):
+            records = (record for record, _, _ in iter_live_records(path))
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            records = data if isinstance(data, list) else consolidated_records(data)
+        added = sum(self.add(client_id, record) for record in records)
+        self.flush()
+        return added
+
+    # === Queries ===
+    def values(self, client_id=None, section=None, field=None, file_name=None, value_like=None, limit=None):
+        # Rows across every stored upload, in document order
+        where, params = self._where(client_id, section, field, file_name, value_like)
+        sql = ("SELECT client_id, file_name, page_number, section, field, item, value FROM field_values"
+               f"{where} ORDER BY client_id, file_name, page_number, section, item, field")
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        columns = ("client_id", "file_name", "page_number", "section", "field", "item", "value")
+        return [dict(zip(columns, row)) for row in self.conn.execute(sql, params)]
+
+    def value_counts(self, client_id=None, section=None, field=None, file_name=None, value_like=None):
+        # Distinct values with how many pages and documents mention them
+        where, params = self._where(client_id, section, field, file_name, value_like)
+        sql = ("SELECT section, field, value, COUNT(*), COUNT(DISTINCT file_name) FROM field_values"
+               f"{where} GROUP BY section, field, value ORDER BY COUNT(*) DESC, value")
+        return [
+            {"section": s, "field": f, "value": v, "pages": n, "files": docs}
+            for s, f, v, n, docs in self.conn.execute(sql, params)
+        ]
+
+    def clients(self):
+        sql = ("SELECT client_id, COUNT(DISTINCT file_name), COUNT(*), MAX(stored_at) FROM pages "
+               "GROUP BY client_id ORDER BY client_id")
+        return [
+            {"client_id": c, "files": files, "pages": pages, "updated_at": updated}
+            for c, files, pages, updated in self.conn.execute(sql)
+        ]
+
+    @staticmethod
+    def _where(client_id, section, field, file_name, value_like):
+        clauses, params = [], []
+        for column, value in (("client_id", client_id), ("section", section),
+                              ("field", field), ("file_name", file_name)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if value_like:
+            clauses.append("value LIKE ?")
+            params.append(f"%{value_like}%")
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+def consolidated_records(consolidated):
+    # final_consolidated_output.json -> page records, rebuilt from each value's source citation
+    pages = {}
+
+    def page(source):
+        key = (source["file"], source["page"])
+        if key not in pages:
+            pages[key] = {"file_name": key[0], "page_number": key[1], "content": {VISITS_SECTION: []}}
+        return pages[key]["content"]
+
+    for path, entries in consolidated.items():
+        if path == VISITS_SECTION:
+            for visit in entries:
+                page(visit["source"])[VISITS_SECTION].append({k: v for k, v in visit.items() if k != "source"})
+            continue
+        section, field = path.split(".", 1)
+        for entry in entries:
+            fields = page(entry["source"]).setdefault(section, {})
+            fields.setdefault(field, []).append(entry["value"])
+    return list(pages.values())
+
+
+def split_field(path):
+    # "MedicalHistory.diagnosis" -> ("MedicalHistory", "diagnosis"); "MedicalVisits" -> ("MedicalVisits", None)
+    if not path:
+        return None, None
+    section, _, field = path.partition(".")
+    return section, field or None
+
+
+# === CLI ===
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Cross-document store of extracted field values")
+    parser.add_argument("--db", required=True, help="SQLite result store")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    load = commands.add_parser("import", help="Import api_results.json, live JSONL logs or final_consolidated_output.json")
+    load.add_argument("--client_id", required=True)
+    load.add_argument("paths", nargs="+")
+
+    query = commands.add_parser("query", help="Values across every stored upload")
+    query.add_argument("--client_id", default=None)
+    query.add_argument("--field", default=None, help="Section or Section.field, e.g. MedicalHistory.diagnosis")
+    query.add_argument("--file_name", default=None)
+    query.add_argument("--value_like", default=None, help="Substring match on the value")
+    query.add_argument("--counts", action="store_true", help="Distinct values with page and document counts")
+    query.add_argument("--limit", type=int, default=200)
+
+    commands.add_parser("clients", help="Stored clients with file and page counts")
+    args = parser.parse_args()
+
+    store = ResultStore(args.db)
+    if args.command == "import":
+        for path in args.paths:
+            start = time.perf_counter()
+            added = store.import_file(path, args.client_id)
+            print(f"📥 {os.path.basename(path)}: {added} pages for {args.client_id} "
+                  f"({(time.perf_counter() - start) * 1000:.0f} ms)")
+    elif args.command == "query":
+        section, field = split_field(args.field)
+        start = time.perf_counter()
+        if args.counts:
+            rows = store.value_counts(args.client_id, section, field, args.file_name, args.value_like)[:args.limit]
+        else:
+            rows = store.values(args.client_id, section, field, args.file_name, args.value_like, args.limit)
+        elapsed = (time.perf_counter() - start) * 1000
+        for row in rows:
+            print(json.dumps(row, ensure_ascii=False))
+        print(f"🔎 {len(rows)} rows in {elapsed:.1f} ms")
+    else:
+        for row in store.clients():
+            print(json.dumps(row))
+    store.close()
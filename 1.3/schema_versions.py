@@ -0,0 +1,80 @@
+import json
+import hashlib
+from typing import NamedTuple
+
+from checkpoint import iter_live_records
+
+# Filled in by the pipeline itself, not versioned
+PAGE_KEYS = ("page_number", "file_name")
+
+
+# === Section Versions ===
+def section_versions(template):
+    # {section: short hash of its template}; any added, removed or renamed field changes it
+    return {
+        section: hashlib.sha1(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()[:10]
+        for section, value in template.items() if section not in PAGE_KEYS
+    }
+
+
+def template_subset(template, sections):
+    # The page keys plus the given sections, in template order
+    return {key: value for key, value in template.items() if key in PAGE_KEYS or key in sections}
+
+
+def _fills_shape(value, shape):
+    # Whether an extracted section has every field of its template (null sections count as filled)
+    if isinstance(shape, list):
+        item_shape = shape[0] if shape and isinstance(shape[0], dict) else {}
+        items = [item for item in value if isinstance(item, dict)] if isinstance(value, list) else []
+        return all(set(item_shape) <= set(item) for item in items)
+    if isinstance(shape, dict) and isinstance(value, dict):
+        return set(shape) <= set(value)
+    return True
+
+
+def recorded_versions(record, template, versions):
+    # Section versions that produced a page record. Records written before versioning
+    # (and copies of other pages) are judged by shape: a section counts as current when
+    # it has every field the template asks for now.
+    if "schema_versions" in record:
+        return record["schema_versions"]
+    content = record.get("content") or {}
+    return {
+        section: version for section, version in versions.items()
+        if section in content and _fills_shape(content[section], template[section])
+    }
+
+
+def stale_sections(record, template, versions):
+    # Sections of the current template a page record is missing or has an older version of
+    recorded = recorded_versions(record, template, versions)
+    return tuple(section for section, version in versions.items() if recorded.get(section) != version)
+
+
+def stale_pages(live_path, completed, template, versions):
+    # {(file_name, page_number): stale sections} for the published record of every completed page
+    stale = {}
+    for record, start, end in iter_live_records(live_path):
+        key = (record.get("file_name"), record.get("page_number"))
+        if completed.get(key) != (start, end):
+            continue
+        sections = stale_sections(record, template, versions)
+        if sections:
+            stale[key] = sections
+    return stale
+
+
+def merge_sections(base_content, delta_content, sections):
+    # The stored page with the re-extracted sections swapped in
+    merged = dict(base_content)
+    for section in sections:
+        merged[section] = delta_content.get(section)
+    return merged
+
+
+# === Delta Units ===
+class SectionDelta(NamedTuple):
+    # Packing group of a page that only needs `sections` re-extracted; tier is its triage group
+    tier: object
+    sections: tuple
@@ -1,37 +1,268 @@
 import os
 import time
 import json
-import re
-import multiprocessing
+import copy
+import hashlib
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from mistralai import Mistral
 from tqdm import tqdm
 import argparse
+from rate_limiter import KeyRateLimiter, parse_throttle
+from extraction_engine import ExtractionEngine, KeySlot, load_api_keys
+from response_cache import ResponseCache
+from checkpoint import load_checkpoint, truncate_partial_tail, read_record
+from page_splitter import iter_page_blocks, PageIndex
+from page_packer import pack_pages, split_multi_page_result, SplitPageAssembler
+from prompt_compiler import PromptCompiler, estimate_tokens, estimate_message_tokens
+from json_repair import extract_json
+from page_triage import PageTriage, SectionRouter, SKIP, CHEAP, page_body
+from near_duplicates import NearDuplicateIndex
+from checkpoint import is_completed
+from result_sink import ResultSink, PageSpans, write_final_outputs
+from consolidation import Consolidator
+from result_store import ResultStore
+from metrics import MetricsRegistry
+from hedging import HedgePolicy
+from schema_versions import (section_versions, template_subset, recorded_versions, stale_pages,
+                             merge_sections, SectionDelta)
 
 # === ARG PARSING ===
+def add_job_arguments(parser):
+    # Inputs and outputs of one run
+    parser.add_argument("--input_text", default=None, help="One extracted text file (with --output_json/--output_stats)")
+    parser.add_argument("--output_json", default=None)
+    parser.add_argument("--output_stats", default=None)
+    parser.add_argument("--batch", default=None,
+                        help="Directory of extracted .txt files and/or .pdf files, or a manifest listing one per line; "
+                             "every page of every file shares one scheduler")
+    parser.add_argument("--text_dir", default=None,
+                        help="Where text extracted from PDF inputs is written as <pdf stem>.txt "
+                             "(default: --output_dir, or next to --output_json)")
+    parser.add_argument("--output_dir", default=None,
+                        help="Batch mode: <pdf name>_api_results.json / _api_stats.json per document, written as each completes")
+    parser.add_argument("--live_output", required=True)
+    parser.add_argument("--dedupe_index", default=None,
+                        help="Per-client fingerprint index file reused across uploads (in-memory only if omitted)")
+    parser.add_argument("--consolidate_dir", default=None,
+                        help="Folder for final_consolidated_output.json and friends, updated as pages arrive (disabled if omitted)")
+    parser.add_argument("--json_dir", default=None, help="Per-field RAG JSONs (default: JSONdata next to --consolidate_dir)")
+    parser.add_argument("--database_dir", default=None,
+                        help="Insertion records (default: DataForDatabase next to --consolidate_dir)")
+    parser.add_argument("--client_id", default=None, help="Client id for insertion records, e.g. Voss-1234")
+    parser.add_argument("--result_store", default=None,
+                        help="SQLite store of every extracted value across uploads, written as pages arrive (disabled if omitted)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip pages already completed in --live_output and rerun only missing or failed pages")
+    parser.add_argument("--update_sections", action="store_true",
+                        help="Resume, and also re-extract only the schema sections added or changed since each "
+                             "completed page was extracted, merging them into its stored result")
+
+
+def add_shared_arguments(parser):
+    # Scheduling, model and cache settings; shared by every job a worker process runs
+    parser.add_argument("--max_chunk_size", type=int, default=20000,
+                        help="Character budget per request: smaller pages are packed together, larger ones split")
+    parser.add_argument("--max_pages_per_request", type=int, default=4)
+    parser.add_argument("--wait_time", type=float, default=0,
+                        help="Minimum seconds between request starts on one key (0 = rate limiter only)")
+    parser.add_argument("--requests_per_minute", type=float, default=60)
+    parser.add_argument("--tokens_per_minute", type=float, default=None)
+    parser.add_argument("--max_retries", type=int, default=5)
+    parser.add_argument("--json_retries", type=int, default=1,
+                        help="Re-requests for a response whose JSON could not be found or repaired")
+    parser.add_argument("--concurrency_per_key", type=int, default=1)
+    parser.add_argument("--hedge_percentile", type=float, default=0,
+                        help="Send a duplicate of a request still running past this percentile of recent call "
+                             "latencies (e.g. 90) on a key with a free slot; first valid JSON wins (0 = off)")
+    parser.add_argument("--hedge_budget", type=float, default=0.1,
+                        help="Max duplicate requests as a fraction of all requests")
+    parser.add_argument("--pdf_workers", type=int, default=None,
+                        help="Processes extracting text from PDF inputs (default: CPU count)")
+    parser.add_argument("--page_index_dir", default=None,
+                        help="Where <text file>.pages.json page index sidecars are written "
+                             "(default: the text directory, i.e. --text_dir, --output_dir or next to --output_json)")
+    parser.add_argument("--cache_dir", default=None, help="Directory for cached page extractions (disabled if omitted)")
+    parser.add_argument("--cache_max_mb", type=float, default=512)
+    parser.add_argument("--cache_max_age_days", type=float, default=30)
+    parser.add_argument("--triage", choices=["off", "skip", "tiered"], default="skip",
+                        help="skip: drop blank/fax-cover pages locally; tiered: also send low-signal pages to --cheap_model")
+    parser.add_argument("--cheap_model", default="mistral-small-latest")
+    parser.add_argument("--route_sections", action="store_true",
+                        help="Ask each request only for the schema sections its pages mention; the rest are filled with nulls")
+    parser.add_argument("--route_min_hits", type=int, default=1,
+                        help="Keyword/signal hits a page needs before a section is asked for")
+    parser.add_argument("--no_dedupe", action="store_true", help="Send every page even if it repeats an earlier one")
+    parser.add_argument("--dedupe_distance", type=int, default=3, help="Max SimHash bit distance for near-duplicate pages (0-3)")
+    parser.add_argument("--live_flush_every", type=int, default=1,
+                        help="Flush the live log every N records (1 = after every page)")
+    parser.add_argument("--live_fsync", action="store_true", help="fsync the live log on every flush")
+    parser.add_argument("--consolidate_every", type=int, default=25, help="Rewrite consolidated outputs every N new pages")
+    parser.add_argument("--metrics_out", default=None,
+                        help="Export per-stage timings and counters here while running and on exit (.prom = Prometheus text, else JSON)")
+    parser.add_argument("--metrics_every", type=float, default=15, help="Seconds between metrics exports during a run")
+
+
 parser = argparse.ArgumentParser()
-parser.add_argument("--input_text", required=True)
-parser.add_argument("--output_json", required=True)
-parser.add_argument("--output_stats", required=True)
-parser.add_argument("--live_output", required=True)
-parser.add_argument("--max_chunk_size", type=int, default=10000)
-parser.add_argument("--wait_time", type=int, default=60)
-args = parser.parse_args()
+add_job_arguments(parser)
+add_shared_arguments(parser)
 
-# === CONFIGURATION ===
-INPUT_TEXT_PATH = args.input_text
-OUTPUT_JSON_PATH = args.output_json
-OUTPUT_STATS_PATH = args.output_stats
-LIVE_OUTPUT_PATH = args.live_output
-MAX_CHUNK_SIZE = args.max_chunk_size
-WAIT_TIME_SECONDS = args.wait_time
 
-PDF_PATH = os.environ.get("PDF_PATH", "/path/to/fallback.pdf")
-FILE_NAME = os.path.basename(PDF_PATH)
+# === CONFIGURATION ===
+def configure(args):
+    # Sets the process-wide settings below from parsed shared arguments. Runs once at
+    # import with the defaults, so importing this module never reads sys.argv.
+    global MAX_CHUNK_SIZE, MAX_PAGES_PER_REQUEST, WAIT_TIME_SECONDS, REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE
+    global MAX_RETRIES, JSON_RETRIES, CONCURRENCY_PER_KEY, TRIAGE_MODE, DEDUPE, DEDUPE_DISTANCE
+    global LIVE_FLUSH_EVERY, LIVE_FSYNC, CONSOLIDATE_EVERY, METRICS_PATH, METRICS_EVERY, CHEAP_MODEL
+    global API_KEYS, RESPONSE_CACHE, HEDGE_POLICY, SECTION_ROUTER, PDF_WORKERS, PAGE_INDEX_DIR
+    MAX_CHUNK_SIZE = args.max_chunk_size
+    MAX_PAGES_PER_REQUEST = args.max_pages_per_request
+    WAIT_TIME_SECONDS = args.wait_time
+    REQUESTS_PER_MINUTE = args.requests_per_minute
+    TOKENS_PER_MINUTE = args.tokens_per_minute
+    MAX_RETRIES = args.max_retries
+    JSON_RETRIES = args.json_retries
+    CONCURRENCY_PER_KEY = args.concurrency_per_key
+    TRIAGE_MODE = args.triage
+    DEDUPE = not args.no_dedupe
+    DEDUPE_DISTANCE = args.dedupe_distance
+    LIVE_FLUSH_EVERY = args.live_flush_every
+    LIVE_FSYNC = args.live_fsync
+    CONSOLIDATE_EVERY = max(1, args.consolidate_every)
+    METRICS_PATH = args.metrics_out
+    METRICS_EVERY = max(1.0, args.metrics_every)
+    CHEAP_MODEL = args.cheap_model
+    PDF_WORKERS = args.pdf_workers
+    PAGE_INDEX_DIR = args.page_index_dir
+    SECTION_ROUTER = SectionRouter(args.route_min_hits) if args.route_sections else None
+    HEDGE_POLICY = HedgePolicy(args.hedge_percentile, args.hedge_budget) if args.hedge_percentile > 0 else None
+    API_KEYS = load_api_keys()
+    cache_max_bytes = int(args.cache_max_mb * 1024 * 1024)
+    cache_max_age_seconds = args.cache_max_age_days * 24 * 3600
+    RESPONSE_CACHE = ResponseCache(args.cache_dir, cache_max_bytes, cache_max_age_seconds) if args.cache_dir else None
+
+
+MODEL = "mistral-large-latest"
+_defaults = argparse.ArgumentParser(add_help=False)
+add_shared_arguments(_defaults)
+configure(_defaults.parse_args([]))
+
+METRICS = MetricsRegistry()
+METRICS.describe("stage_seconds", "Time spent per pipeline stage")
+METRICS.describe("requests_total", "Chat completion calls by key and outcome")
+METRICS.describe("retries_total", "Repeated calls by reason")
+METRICS.describe("errors_total", "Failed pages by reason")
+METRICS.describe("tokens_total", "Tokens reported by the API")
+METRICS.describe("pages_total", "Pages written to the live log by outcome")
+METRICS.describe("in_flight_requests", "Requests currently running per key")
+METRICS.describe("queue_depth", "Packed requests waiting for a free slot")
+METRICS.describe("cache_lookups_total", "Response cache lookups by result")
+METRICS.describe("cache_writes_total", "Responses written to the cache")
+METRICS.describe("json_repairs_total", "Responses whose JSON needed repair")
+METRICS.describe("hedges_total", "Duplicate requests for stragglers by outcome")
+METRICS.describe("hedge_requests_total", "Requests run under the hedging policy")
+
+
+# === Jobs ===
+class ExtractionJob:
+    # Inputs and outputs of one run. The CLI builds one from its arguments; the worker
+    # daemon builds one per queued job. pages_read / pages_done track progress.
+
+    FIELDS = ("input_text", "batch", "text_dir", "output_json", "output_stats", "output_dir", "live_output",
+              "dedupe_index", "consolidate_dir", "json_dir", "database_dir", "client_id", "result_store", "resume",
+              "update_sections")
+    PATH_FIELDS = ("input_text", "batch", "text_dir", "output_json", "output_stats", "output_dir", "live_output",
+                   "dedupe_index", "consolidate_dir", "json_dir", "database_dir", "result_store")
+
+    def __init__(self, input_text=None, batch=None, text_dir=None, output_json=None, output_stats=None, output_dir=None,
+                 live_output=None, dedupe_index=None, consolidate_dir=None, json_dir=None,
+                 database_dir=None, client_id=None, result_store=None, resume=False, update_sections=False):
+        self.input_text = input_text
+        self.batch = batch
+        self.text_dir = text_dir
+        self.output_json = output_json
+        self.output_stats = output_stats
+        self.output_dir = output_dir
+        self.live_output = live_output
+        self.dedupe_index = dedupe_index
+        self.consolidate_dir = consolidate_dir
+        self.json_dir = json_dir  # default: JSONdata next to consolidate_dir, see derive_defaults()
+        self.database_dir = database_dir  # default: DataForDatabase next to consolidate_dir
+        self.client_id = client_id
+        self.result_store = result_store
+        self.update_sections = bool(update_sections)
+        self.resume = bool(resume) or self.update_sections
+        self.data_root = None
+        self.pages_read = 0
+        self.pages_done = 0
+
+    @classmethod
+    def from_args(cls, args):
+        return cls(**{name: getattr(args, name) for name in cls.FIELDS})
+
+    @classmethod
+    def from_dict(cls, data):
+        unknown = set(data) - set(cls.FIELDS)
+        if unknown:
+            raise ValueError(f"unknown job fields: {', '.join(sorted(unknown))}")
+        return cls(**data)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    def validate(self):
+        if bool(self.input_text) == bool(self.batch):
+            raise ValueError("give exactly one of input_text or batch")
+        if self.input_text and not (self.output_json and self.output_stats):
+            raise ValueError("input_text requires output_json and output_stats")
+        if self.batch and not self.output_dir:
+            raise ValueError("batch requires output_dir")
+        if not self.live_output:
+            raise ValueError("live_output is required")
+        if (self.consolidate_dir or self.result_store) and not self.client_id:
+            raise ValueError("consolidate_dir and result_store require client_id")
+        return self
+
+    def derive_defaults(self):
+        # Unset json_dir / database_dir go next to consolidate_dir, taken as it stands now:
+        # the CLI resolves it against the working directory, confine() against the data root
+        if self.consolidate_dir:
+            consolidate_root = os.path.dirname(os.path.abspath(self.consolidate_dir))
+            self.json_dir = self.json_dir or os.path.join(consolidate_root, "JSONdata")
+            self.database_dir = self.database_dir or os.path.join(consolidate_root, "DataForDatabase")
+        return self
+
+    def confine(self, data_root):
+        # Resolves every path against data_root (relative paths are taken from it) and
+        # rejects any that lands outside, symlinks included. Manifest entries are checked
+        # when the inputs are listed.
+        self.data_root = os.path.realpath(data_root)
+
+        def resolve(names):
+            for name in names:
+                value = getattr(self, name)
+                if not value:
+                    continue
+                if not isinstance(value, str):
+                    raise ValueError(f"{name} must be a path")
+                path = within_root(self.data_root, value)
+                if path is None:
+                    raise ValueError(f"{name} is outside the data root")
+                setattr(self, name, path)
+
+        resolve(self.PATH_FIELDS)
+        # Defaults come from the resolved consolidate_dir, and must stay inside the root too
+        self.derive_defaults()
+        resolve(("json_dir", "database_dir"))
+        return self
+
+def within_root(root, path):
+    # path resolved against root, or None when it resolves outside root
+    resolved = os.path.realpath(os.path.join(root, path))
+    return resolved if os.path.commonpath([root, resolved]) == root else None
 
-API_KEYS = [
-    os.environ.get("MISTRAL_API_KEY"),
-    os.environ.get("MISTRAL_API_KEY2")
-]
 
 # === JSON Template and Prompt ===
 json_template = {
@@ -77,26 +308,19 @@ json_template = {
     }
 }
 
-def build_prompt(page_num, file_name, page_text):
-    return f"""
-        You are a disability lawyer reviewing raw text from a client document. The text was extracted using AI-based OCR and PDF tools from **page {page_num}** of the file **{file_name}**.
-
-        This text may contain misspellings or formatting issues. Despite that, your task is to extract all structured information that may be relevant to evaluating a disability case.
-
-        Imagine you are preparing notes to support a claim — document anything related to medical history, financial status, legal situations, family context, and anything else that could help establish eligibility or clarify the client’s background.
+PROMPT_COMPILER = PromptCompiler(json_template)
+# Recorded on every extracted page, so a schema change only re-extracts the sections it touched
+SCHEMA_VERSIONS = section_versions(json_template)
 
-        Your output must be a single structured JSON object in the following format. Fill in as much as you can. If a field is missing, set it to `null`. Do **not** add extra commentary — just valid JSON.
+@functools.lru_cache(maxsize=None)
+def section_compiler(sections):
+    # Reduced prompt asking only for `sections`
+    return PromptCompiler(template_subset(json_template, sections))
 
-        This JSON **must include the fields** `"page_number"` and `"file_name"` at the top level to indicate the source of the information.
-
-        Here is the expected format:
-
-        {json.dumps(json_template, indent=4)}
-
-        Begin parsing the content from page {page_num} of {file_name} below:
-
-        {page_text}
-    """.strip()
+def extraction_version():
+    # Changes with the models, instructions or schema, so reused extractions always match them
+    recipe = "\n".join([MODEL, CHEAP_MODEL, PROMPT_COMPILER.prefix])
+    return hashlib.sha1(recipe.encode("utf-8")).hexdigest()[:12]
 
 # === Deep Cleaner ===
 def recursively_remove_key(obj, key_to_remove):
@@ -108,112 +332,671 @@ def recursively_remove_key(obj, key_to_remove):
     else:
         return obj
 
-# === Page Splitting ===
-def load_pages_from_file():
-    with open(INPUT_TEXT_PATH, "r", encoding="utf-8") as f:
-        text = f.read()
-
-    pattern = r"=== START OF PAGE (\d+) ON PDF (.+?) ===(.*?)=== END OF PAGE \1 ON PDF \2 ==="
-    matches = re.findall(pattern, text, flags=re.DOTALL)
-
-    page_tuples = []
-    for page_num, file_name, content in matches:
-        full_text_block = f"=== START OF PAGE {page_num} ON PDF {file_name} ==={content}=== END OF PAGE {page_num} ON PDF {file_name} ==="
-        page_tuples.append((int(page_num), full_text_block))
-
-    return page_tuples
+# === Inputs ===
+def input_files(job):
+    if not job.batch:
+        return [job.input_text]
+    if os.path.isdir(job.batch):
+        return sorted(os.path.join(job.batch, name) for name in os.listdir(job.batch)
+                      if name.endswith(".txt") or name.lower().endswith(".pdf"))
+    # Manifest: one text or PDF file per line, relative to the manifest; blank lines and # comments ignored
+    base_dir = os.path.dirname(os.path.abspath(job.batch))
+    with open(job.batch, "r", encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+    paths = [os.path.join(base_dir, line) for line in lines if line and not line.startswith("#")]
+    if job.data_root is not None:
+        outside = [path for path in paths if within_root(job.data_root, path) is None]
+        if outside:
+            raise ValueError(f"manifest lists files outside the data root: {', '.join(outside)}")
+    return paths
+
+def document_output_paths(job, file_name):
+    stem = os.path.splitext(file_name)[0]
+    return (os.path.join(job.output_dir, f"{stem}_api_results.json"),
+            os.path.join(job.output_dir, f"{stem}_api_stats.json"))
+
+def extracted_text_dir(job):
+    return job.text_dir or job.output_dir or os.path.dirname(os.path.abspath(job.output_json))
+
+def page_index_dir(job):
+    # Sidecars go with the job's outputs, never beside input text the job does not own
+    return PAGE_INDEX_DIR or extracted_text_dir(job)
 
-# === JSON Extraction ===
-def extract_first_json(response_text):
+# === Page Splitting ===
+async def page_sources(job):
+    # (text path, async PageBlock iterator) per input file. PDFs are extracted on a process
+    # pool that works ahead of the LLM stage; each page is queued as soon as its range is
+    # done and written out, and waiting on the pool never blocks the event loop.
+    paths = input_files(job)
+    pdf_paths = [path for path in paths if path.lower().endswith(".pdf")]
+    index_dir = page_index_dir(job)
+    extracted = None
+    if pdf_paths:
+        # pdfminer is only needed (and imported) for PDF inputs
+        from pdf_extractor import PdfTextExtractor
+        extracted = PdfTextExtractor(PDF_WORKERS, index_dir=index_dir).documents(pdf_paths, extracted_text_dir(job))
     try:
-        match = re.search(r'\{.*\}', response_text, re.DOTALL)
-        if match:
-            return json.loads(match.group(0))
-    except Exception as e:
-        print(f"❌ Error extracting JSON: {e}")
-    return None
+        for path in paths:
+            if path.lower().endswith(".pdf"):
+                yield await anext(extracted)
+            else:
+                yield path, iterate_async(load_pages_from_file(path, index_dir))
+    finally:
+        if extracted is not None:
+            await extracted.aclose()
+
+async def iterate_async(items):
+    for item in items:
+        yield item
+
+def load_pages_from_file(path, index_dir=None):
+    # Streams PageBlocks off an mmap so the first request goes out as soon as page 1 is parsed;
+    # each page carries the PDF name from its own START/END marker. The page index sidecar
+    # (<name>.pages.json, beside path or under index_dir) is written once the whole file is split.
+    entries = {}
+    for page in iter_page_blocks(path):
+        entries[(page.file_name, page.page_number)] = (page.offset, page.length)
+        yield page
+    PageIndex(path, entries, index_dir=index_dir).save()
 
 # === API Worker ===
-def api_worker(worker_id, api_key, page_tuples, result_queue):
-    client = Mistral(api_key=api_key)
-    progress = tqdm(total=len(page_tuples), desc=f"Worker {worker_id}", position=worker_id)
-
-    for page_num, page_text in page_tuples:
-        full_prompt = build_prompt(page_num, FILE_NAME, page_text)
-        start_time = time.time()
-
+async def call_with_rate_limit(key_slot, messages, expected_tokens, model=MODEL):
+    # Retries throttled calls after the limiter's backoff; other errors propagate
+    for attempt in range(MAX_RETRIES + 1):
+        with METRICS.timer("stage_seconds", stage="rate_limit_wait"):
+            await key_slot.limiter.acquire_async(expected_tokens)
         try:
-            response = client.chat.complete(
-                model="mistral-large-latest",
-                messages=[{"role": "user", "content": full_prompt}]
-            )
-            raw_text = response.choices[0].message.content
-            json_result = extract_first_json(raw_text)
-            if json_result is not None:
-                # Deep clean any stray 'file_name'
-                json_result = recursively_remove_key(json_result, "file_name")
-                json_result["page_number"] = page_num
-                json_result["file_name"] = FILE_NAME
-            content = json_result if json_result else {"error": "No valid JSON found"}
+            with METRICS.timer("stage_seconds", stage="api_call"):
+                response = await key_slot.client.chat.complete_async(
+                    model=model,
+                    messages=messages
+                )
         except Exception as e:
-            content = {"error": f"API Error: {e}"}
+            throttled, retry_after = parse_throttle(e)
+            METRICS.inc("requests_total", key=key_slot.key_id, outcome="throttled" if throttled else "error")
+            if not throttled or attempt == MAX_RETRIES:
+                raise
+            METRICS.inc("retries_total", reason="throttle")
+            pause = key_slot.limiter.record_throttle(retry_after)
+            tqdm.write(f"⏳ Key {key_slot.key_id} throttled (attempt {attempt + 1}), backing off {pause:.1f}s")
+            continue
+        key_slot.limiter.record_success()
+        METRICS.inc("requests_total", key=key_slot.key_id, outcome="ok")
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            METRICS.inc("tokens_total", usage.prompt_tokens or 0, kind="prompt", model=model)
+            METRICS.inc("tokens_total", usage.completion_tokens or 0, kind="completion", model=model)
+        return response
+
+def build_unit_messages(unit, compiler=PROMPT_COMPILER):
+    file_name = unit.pages[0].file_name
+    if len(unit.pages) > 1:
+        return compiler.compile_pages(unit.page_numbers, file_name, unit.text)
+    part_note = f" (part {unit.part} of {unit.parts} of this page)" if unit.parts else ""
+    return compiler.compile_page(unit.page_numbers[0], file_name, unit.text, part_note)
+
+def answers_unit(json_result, unit):
+    # Whether a response maps to at least one page of the request
+    return any(content is not None for content in split_multi_page_result(json_result, unit.page_numbers).values())
+
+async def request_json(key_slot, unit, messages, expected_tokens, model):
+    # Repairable responses are kept; only unrecoverable ones, or ones that answer none of
+    # the request's pages, cost another request
+    raw_text = ""
+    json_result, repairs = None, []
+    for attempt in range(JSON_RETRIES + 1):
+        response = await call_with_rate_limit(key_slot, messages, expected_tokens, model)
+        raw_text = response.choices[0].message.content
+        with METRICS.timer("stage_seconds", stage="json_parse"):
+            json_result, repairs = extract_json(raw_text)
+        if repairs:
+            METRICS.inc("json_repairs_total")
+        if json_result is not None and answers_unit(json_result, unit):
+            break
+        problem = "No JSON" if json_result is None else "No requested page"
+        tqdm.write(f"⚠️ {problem} in response for pages {unit.page_numbers} on key {key_slot.key_id} (attempt {attempt + 1})")
+        if attempt < JSON_RETRIES:
+            METRICS.inc("retries_total", reason="no_json")
+    return json_result, repairs, raw_text
+
+async def api_worker(key_slot, unit, key_slots=()):
+    file_name = unit.pages[0].file_name
+    # Section deltas only ask for the sections a schema change touched; routed requests only
+    # the sections their pages mention
+    delta = unit.group if isinstance(unit.group, SectionDelta) else None
+    tier = delta.tier if delta else unit.group
+    routed = SECTION_ROUTER.route_pages(unit.pages) if SECTION_ROUTER and not delta else None
+    if routed is not None and len(routed) == len(SCHEMA_VERSIONS):
+        routed = None
+    if delta:
+        compiler = section_compiler(delta.sections)
+    elif routed is not None:
+        compiler = section_compiler(routed)
+    else:
+        compiler = PROMPT_COMPILER
+    messages = build_unit_messages(unit, compiler)
+    model = CHEAP_MODEL if tier == CHEAP else MODEL
+    prompt_tokens = estimate_message_tokens(messages)
+    raw_text = ""
+    repairs = []
+    answered_by = key_slot
+    hedged = False
+    start_time = time.time()
+
+    cache_key = ResponseCache.make_key(model, messages) if RESPONSE_CACHE else None
+    cached = RESPONSE_CACHE.get(cache_key) if RESPONSE_CACHE else None
+    if RESPONSE_CACHE:
+        METRICS.inc("cache_lookups_total", result="miss" if cached is None else "hit")
+
+    try:
+        if cached is not None:
+            json_result = cached
+        else:
+            expected_tokens = prompt_tokens + compiler.schema_tokens * len(unit.pages)
+
+            def attempt(slot):
+                return request_json(slot, unit, messages, expected_tokens, model)
+
+            if HEDGE_POLICY is not None:
+                (json_result, repairs, raw_text), answered_by, hedged = await HEDGE_POLICY.run(
+                    attempt, key_slot, key_slots, CONCURRENCY_PER_KEY,
+                    is_valid=lambda result: result[0] is not None and answers_unit(result[0], unit), metrics=METRICS
+                )
+            else:
+                json_result, repairs, raw_text = await attempt(key_slot)
+        page_results = split_multi_page_result(json_result, unit.page_numbers)
+        # Only complete answers are cached; a partial one would fail the same pages on every rerun
+        if cached is None and RESPONSE_CACHE and all(content is not None for content in page_results.values()):
+            RESPONSE_CACHE.put(cache_key, json_result)
+            METRICS.inc("cache_writes_total")
+        error = "No valid JSON found" if json_result is None else "Page missing from packed response"
+        error_reason = "no_json" if json_result is None else "page_missing"
+    except Exception as e:
+        page_results = {}
+        error = f"API Error: {e}"
+        error_reason = "api"
+    missing = sum(1 for page in unit.pages if page_results.get(page.page_number) is None)
+    if missing:
+        METRICS.inc("errors_total", missing, reason=error_reason)
+
+    end_time = time.time()
+    records = []
+    for page in unit.pages:
+        page_num = page.page_number
+        json_result = page_results.get(page_num)
+
+        # Tokens actually spent, apportioned to the pages of a packed request; cache hits cost nothing
+        share = len(page.text) / max(1, sum(len(p.text) for p in unit.pages))
+        if cached is not None:
+            page_prompt_tokens = page_completion_tokens = 0
+        else:
+            page_prompt_tokens = round(prompt_tokens * share)
+            page_completion_tokens = (
+                estimate_tokens(json.dumps(json_result)) if json_result is not None and len(unit.pages) > 1
+                else round(estimate_tokens(raw_text) * share)
+            )
+
+        if json_result is not None:
+            # Deep clean any stray 'file_name'
+            json_result = recursively_remove_key(json_result, "file_name")
+            json_result["page_number"] = page_num
+            json_result["file_name"] = file_name
+            if routed is not None:
+                json_result = fill_unrouted_sections(json_result, routed)
+        content = json_result if json_result else {"error": error}
 
-        end_time = time.time()
         result_data = {
-            "worker": worker_id,
+            "worker": answered_by.key_id,
             "page_number": page_num,
-            "file_name": FILE_NAME,
+            "file_name": file_name,
             "duration": round(end_time - start_time, 2),
-            "char_count": len(page_text),
+            "char_count": len(page.text),
+            "prompt_tokens": page_prompt_tokens,
+            "completion_tokens": page_completion_tokens,
+            "cached": cached is not None,
             "content": content
         }
+        if tier:
+            result_data["triage"] = tier
+        if json_result is not None:
+            result_data["schema_versions"] = (
+                {section: SCHEMA_VERSIONS[section] for section in delta.sections} if delta else SCHEMA_VERSIONS
+            )
+        if delta:
+            result_data["updated_sections"] = list(delta.sections)
+        if routed is not None:
+            result_data["routed_sections"] = list(routed)
+        if repairs:
+            result_data["json_repairs"] = repairs
+        if hedged:
+            result_data["hedged"] = True
+        if len(unit.pages) > 1:
+            result_data["packed_pages"] = unit.page_numbers
+        if unit.parts:
+            result_data["part"] = unit.part
+            result_data["parts"] = unit.parts
+        records.append(result_data)
+    return records
+
+def fill_unrouted_sections(content, routed):
+    # Sections the router did not ask for are filled in as the all-null template
+    filled = dict(content)
+    for section in SCHEMA_VERSIONS:
+        if section not in routed:
+            filled[section] = copy.deepcopy(json_template[section])
+    return filled
+
+def local_page_record(page, content, **extra):
+    # Record for a page resolved without an API call
+    content = copy.deepcopy(content)
+    content["page_number"] = page.page_number
+    content["file_name"] = page.file_name
+    return {
+        "worker": 0,
+        "page_number": page.page_number,
+        "file_name": page.file_name,
+        "duration": 0.0,
+        "char_count": len(page.text),
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "cached": False,
+        **extra,
+        "content": content
+    }
 
-        with open(LIVE_OUTPUT_PATH, "a", encoding="utf-8") as out_file:
-            out_file.write(json.dumps(result_data, indent=2) + "\n")
-
-        result_queue.put(result_data)
-        progress.update(1)
-        time.sleep(WAIT_TIME_SECONDS)
-
-    progress.close()
-
-# === Main Runner ===
-def run_parallel_requests():
-    all_pages = load_pages_from_file()
-    even_pages = [(n, t) for (n, t) in all_pages if n % 2 == 0]
-    odd_pages = [(n, t) for (n, t) in all_pages if n % 2 != 0]
-
-    manager = multiprocessing.Manager()
-    result_queue = manager.Queue()
-    processes = []
-
-    for i, page_set in enumerate([even_pages, odd_pages]):
-        p = multiprocessing.Process(
-            target=api_worker,
-            args=(i + 1, API_KEYS[i], page_set, result_queue)
+def skipped_page_record(page, decision):
+    # Skipped pages keep their place in the outputs as an all-null template
+    return local_page_record(page, json_template, triage=SKIP, skip_reason=decision.reason,
+                             schema_versions=SCHEMA_VERSIONS)
+
+def duplicate_page_record(page, content, source_key):
+    # Copy of a near-identical page's extraction, cited to this page
+    source = {"file_name": source_key[0], "page_number": source_key[1]}
+    return local_page_record(page, content, duplicate_of=source)
+
+async def triage_pages(pages, on_skipped):
+    page_triage = PageTriage()
+    async for page in pages:
+        decision = page_triage.classify(page.text)
+        if decision.tier == SKIP:
+            on_skipped([skipped_page_record(page, decision)])
+            continue
+        yield page, (decision.tier if TRIAGE_MODE == "tiered" else None)
+
+def build_key_slots():
+    return [
+        KeySlot(
+            i + 1,
+            Mistral(api_key=api_key),
+            KeyRateLimiter(
+                REQUESTS_PER_MINUTE,
+                tokens_per_minute=TOKENS_PER_MINUTE,
+                min_interval=WAIT_TIME_SECONDS
+            )
         )
-        processes.append(p)
-        p.start()
+        for i, api_key in enumerate(API_KEYS)
+    ]
+
+def page_outcome(result_data):
+    if result_data.get("triage") == SKIP:
+        return "skipped"
+    if "duplicate_of" in result_data:
+        return "duplicate"
+    if not is_completed(result_data):
+        return "failed"
+    return "cached" if result_data.get("cached") else "completed"
+
+# === Metrics Export ===
+def export_metrics():
+    if METRICS_PATH:
+        METRICS.write(METRICS_PATH)
+
+async def export_metrics_periodically():
+    while True:
+        await asyncio.sleep(METRICS_EVERY)
+        export_metrics()
 
-    for p in processes:
-        p.join()
-
-    results = []
-    while not result_queue.empty():
-        results.append(result_queue.get())
-
-    results.sort(key=lambda x: x["page_number"])
-
-    with open(OUTPUT_JSON_PATH, "w", encoding="utf-8") as f:
-        json.dump(results, f, indent=2)
-
-    with open(OUTPUT_STATS_PATH, "w", encoding="utf-8") as f:
-        json.dump([{k: v for k, v in r.items() if k != "content"} for r in results], f, indent=2)
+# === Main Runner ===
+async def run_engine(pages, sink, key_slots, dedupe_index=None, on_emitted=None, deltas=None, load_record=None):
+    # pages: async iterator of PageBlocks; every stage below is an async generator over it
+    # deltas: {(file_name, page_number): stale sections} of stored pages that only need those
+    # sections re-extracted; load_record(key) returns the stored record they are merged into
+    engine = ExtractionEngine(key_slots, functools.partial(api_worker, key_slots=key_slots),
+                              concurrency_per_key=CONCURRENCY_PER_KEY, metrics=METRICS)
+    progress = tqdm(desc=f"{len(key_slots)} keys x {CONCURRENCY_PER_KEY}", unit="page")
+    assembler = SplitPageAssembler()
+    page_groups = {}
+    followers = {}  # representative page key -> near-duplicate pages waiting on its result
+    orphans = []    # followers whose representative failed; sent themselves afterwards
+    # Followers keep their page_groups entry (their triage tier) until they are resolved, so
+    # an orphan is packed and prompted with its own tier, not the default full prompt
+
+    def emit(result_data):
+        with METRICS.timer("stage_seconds", stage="live_write"):
+            span = sink.write(result_data)
+        METRICS.inc("pages_total", outcome=page_outcome(result_data))
+        if on_emitted is not None:
+            on_emitted(result_data, span)
+        progress.update(1)
 
-    print(f"✅ All results saved to {OUTPUT_JSON_PATH}")
-    print(f"📡 Live log written to {LIVE_OUTPUT_PATH}")
-    print(f"📊 Stats written to {OUTPUT_STATS_PATH}")
+    def resolve_followers(result_data):
+        key = (result_data["file_name"], result_data["page_number"])
+        waiting = followers.pop(key, [])
+        if is_completed(result_data):
+            dedupe_index.set_content(key, result_data["content"])
+            for page in waiting:
+                page_groups.pop(page, None)
+                emit(duplicate_page_record(page, result_data["content"], key))
+        else:
+            dedupe_index.remove(key)
+            orphans.extend(waiting)
+
+    def merge_delta(result_data):
+        # A failed delta leaves the stored record published; the next update retries it
+        key = (result_data["file_name"], result_data["page_number"])
+        if not is_completed(result_data):
+            return
+        base = load_record(key)
+        sections = result_data["updated_sections"]
+        result_data["content"] = merge_sections(base["content"], result_data["content"], sections)
+        result_data["schema_versions"] = {**recorded_versions(base, json_template, SCHEMA_VERSIONS),
+                                          **result_data["schema_versions"]}
+        if dedupe_index is not None:
+            dedupe_index.set_content(key, result_data["content"])
+
+    def on_result(records):
+        for result_data in records:
+            if result_data.get("parts"):
+                result_data = assembler.add(result_data, result_data.pop("part"), result_data["parts"])
+                if result_data is None:
+                    continue
+            if "updated_sections" in result_data:
+                merge_delta(result_data)
+                emit(result_data)
+                continue
+            emit(result_data)
+            if dedupe_index is not None and result_data.get("triage") != SKIP:
+                resolve_followers(result_data)
+
+    async def triaged_pages(stage):
+        async for page, group in triage_pages(stage, on_result):
+            page_groups[page] = group
+            yield page
+
+    async def section_deltas(stage):
+        async for page in stage:
+            sections = deltas.get((page.file_name, page.page_number))
+            if sections is not None:
+                page_groups[page] = SectionDelta(page_groups.get(page), sections)
+            yield page
+
+    async def deduplicated_pages(stage):
+        # Only the first page of each near-duplicate cluster is sent; the rest copy its result
+        async for page in stage:
+            if isinstance(page_groups.get(page), SectionDelta):
+                yield page
+                continue
+            fingerprint = dedupe_index.fingerprint(page_body(page.text))
+            if fingerprint is None:
+                yield page
+                continue
+            match = dedupe_index.find(fingerprint, exclude=(page.file_name, page.page_number))
+            if match is None:
+                dedupe_index.add((page.file_name, page.page_number), fingerprint)
+                yield page
+                continue
+            if dedupe_index.entries[match]["content"] is not None:
+                page_groups.pop(page, None)
+                emit(duplicate_page_record(page, dedupe_index.entries[match]["content"], match))
+            else:
+                followers.setdefault(match, []).append(page)
+
+    stage = pages
+    if TRIAGE_MODE != "off":
+        stage = triaged_pages(stage)
+    if deltas:
+        stage = section_deltas(stage)
+    if dedupe_index is not None:
+        stage = deduplicated_pages(stage)
+
+    def group_of(page):
+        return page_groups.pop(page, None)
+
+    exporter = asyncio.create_task(export_metrics_periodically()) if METRICS_PATH else None
+    try:
+        await engine.run(pack_pages(stage, MAX_CHUNK_SIZE, MAX_PAGES_PER_REQUEST, group_of), on_result)
+        if orphans:
+            tqdm.write(f"🔁 Sending {len(orphans)} duplicate pages whose representative failed")
+            await engine.run(pack_pages(orphans, MAX_CHUNK_SIZE, MAX_PAGES_PER_REQUEST, group_of), on_result)
+    finally:
+        if exporter is not None:
+            exporter.cancel()
+        progress.close()
+
+async def run_job(job, key_slots=None):
+    # One run over the job's inputs. The worker daemon passes its long-lived key slots, so
+    # clients, connection pools and rate limits are shared by every job it runs. Whole-file
+    # work runs off the event loop, which the daemon's other jobs are using meanwhile.
+    # The summary reports this job's own metrics; METRICS keeps the process-wide totals.
+    with METRICS.scope() as job_metrics:
+        return await _run_job(job, key_slots or build_key_slots(), job_metrics)
+
+async def _run_job(job, key_slots, job_metrics):
+    dedupe_index = None
+    if DEDUPE:
+        dedupe_index = await asyncio.to_thread(NearDuplicateIndex.load, job.dedupe_index,
+                                               max_distance=DEDUPE_DISTANCE, version=extraction_version())
+
+    completed = {}
+    if job.resume:
+        completed, valid_end = await asyncio.to_thread(load_checkpoint, job.live_output)
+        await asyncio.to_thread(truncate_partial_tail, job.live_output, valid_end)
+        print(f"♻️ Resuming: {len(completed)} pages already completed")
+    deltas = {}
+    if job.update_sections:
+        deltas = await asyncio.to_thread(stale_pages, job.live_output, completed, json_template, SCHEMA_VERSIONS)
+        sections = sorted({section for stale in deltas.values() for section in stale})
+        print(f"🧩 Updating {len(deltas)} completed pages: {', '.join(sections) or 'schema unchanged'}")
+
+    # Final outputs, the consolidation and the result store are written by one thread per job,
+    # in submission order; stage times are recorded back on the loop, which owns METRICS
+    loop = asyncio.get_running_loop()
+    writer = ThreadPoolExecutor(1, thread_name_prefix="job-writer")
+    writes = set()
+    write_errors = []
+
+    def write_async(stage, fn, *args):
+        def timed():
+            start = time.perf_counter()
+            fn(*args)
+            return time.perf_counter() - start
+
+        def done(future):
+            writes.discard(future)
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                write_errors.append(future.exception())
+            else:
+                METRICS.observe("stage_seconds", future.result(), stage=stage)
+
+        future = loop.run_in_executor(writer, timed)
+        writes.add(future)
+        future.add_done_callback(done)
+
+    async def drain():
+        while writes:
+            await asyncio.wait(set(writes))
+        if write_errors:
+            raise write_errors[0]
+
+    # Earlier runs' records only count when resuming; otherwise this run's records are the output
+    spans = PageSpans(completed)
+    documents = {}  # file_name -> {"pages": page numbers, "pending": pages not yet emitted, "read": bool}
+    totals = dict.fromkeys(["pages", "skipped", "duplicates", "prompt_tokens", "completion_tokens"], 0)
+    consolidator = store = None
+    try:
+        # Built on the writer thread: the consolidator reads its state file, and the store's
+        # SQLite connection may only be used by the thread that opened it
+        if job.consolidate_dir:
+            consolidator = await loop.run_in_executor(
+                writer, Consolidator, job.consolidate_dir, job.json_dir, job.database_dir, job.client_id)
+        if job.result_store:
+            store = await loop.run_in_executor(writer, ResultStore, job.result_store)
+        consolidated = 0
+        if job.batch:
+            os.makedirs(job.output_dir, exist_ok=True)
+        sink = ResultSink(job.live_output, LIVE_FLUSH_EVERY, LIVE_FSYNC)
+
+        def fold_in(record):
+            # Resumed pages are folded into the consolidation and store too (a no-op for pages they already have)
+            if consolidator is not None:
+                consolidator.add(record)
+            if store is not None:
+                store.add(job.client_id, record)
+
+        def add_emitted(record):
+            nonlocal consolidated
+            if consolidator is not None and consolidator.add(record):
+                consolidated += 1
+                if consolidated % CONSOLIDATE_EVERY == 0:
+                    consolidator.flush()
+            if store is not None:
+                store.add(job.client_id, record)
+
+        def publish(keys, output_json, output_stats, on_written=None):
+            sink.flush()
+            selected = spans.select(keys)
+
+            def write():
+                written = write_final_outputs(job.live_output, output_json, output_stats, selected,
+                                              on_record=fold_in if consolidator or store else None)
+                if store is not None:
+                    store.flush()
+                for name, value in written.items():
+                    totals[name] += value
+                if on_written is not None:
+                    on_written(written)
+
+            write_async("final_write", write)
+
+        def publish_document(file_name):
+            doc = documents.pop(file_name)
+            output_json, output_stats = document_output_paths(job, file_name)
+            publish([(file_name, n) for n in doc["pages"]], output_json, output_stats,
+                    lambda written: tqdm.write(f"📄 {file_name}: {written['pages']} pages → {output_json}"))
+
+        def on_emitted(record, span):
+            spans.update((record["file_name"], record["page_number"]), span, is_completed(record))
+            if consolidator is not None or store is not None:
+                write_async("consolidate" if consolidator is not None else "store_write", add_emitted, record)
+            job.pages_done += 1
+            doc = documents.get(record["file_name"])
+            if doc is not None:
+                doc["pending"] -= 1
+                if job.batch and doc["read"] and doc["pending"] == 0:
+                    publish_document(record["file_name"])
+
+        async def pending_pages():
+            async for _, pages in page_sources(job):
+                names = set()
+                async for page in pages:
+                    doc = documents.setdefault(page.file_name, {"pages": set(), "pending": 0, "read": False})
+                    names.add(page.file_name)
+                    doc["pages"].add(page.page_number)
+                    key = (page.file_name, page.page_number)
+                    if key in completed and key not in deltas:
+                        continue
+                    doc["pending"] += 1
+                    job.pages_read += 1
+                    yield page
+                # Every page of these documents is queued; they publish when the last one lands
+                for name in names:
+                    documents[name]["read"] = True
+                    if job.batch and documents[name]["pending"] == 0:
+                        publish_document(name)
+
+        with sink:
+            try:
+                await run_engine(pending_pages(), sink, key_slots, dedupe_index, on_emitted,
+                                 deltas, lambda key: read_record(job.live_output, completed[key]))
+            finally:
+                # Also exported when a run dies, so the last state is there to look at
+                export_metrics()
+            if job.batch:
+                for file_name in list(documents):
+                    publish_document(file_name)
+            else:
+                keys = [(name, n) for name, doc in documents.items() for n in doc["pages"]]
+                publish(keys, job.output_json, job.output_stats)
+            await drain()
+
+        if consolidator is not None:
+            write_async("consolidate", consolidator.close)
+        if store is not None:
+            write_async("store_write", store.close)
+        if dedupe_index is not None and job.dedupe_index:
+            write_async("dedupe_write", dedupe_index.save, job.dedupe_index)
+        await drain()
+    finally:
+        writer.shutdown(wait=False)
+
+    if job.batch:
+        print(f"✅ Per-document results saved to {job.output_dir}")
+    else:
+        print(f"✅ All results saved to {job.output_json}")
+        print(f"📊 Stats written to {job.output_stats}")
+    print(f"📡 Live log written to {job.live_output}")
+    if totals["skipped"]:
+        print(f"🚫 Skipped {totals['skipped']} pages with no extractable content (marked with \"triage\": \"skip\")")
+    print(f"🔢 Estimated tokens: {totals['prompt_tokens']} prompt, {totals['completion_tokens']} completion")
+
+    if totals["duplicates"]:
+        print(f"🧬 Reused extractions for {totals['duplicates']} near-duplicate pages (marked with \"duplicate_of\")")
+    if consolidator is not None:
+        print(f"🗂️ Consolidated outputs for {job.client_id} updated in {job.consolidate_dir}, {job.json_dir} and {job.database_dir}")
+    if store is not None:
+        print(f"🗃️ Values for {job.client_id} stored in {job.result_store}")
+
+    if RESPONSE_CACHE:
+        # Eviction walks the whole cache directory: the CLI does it once after the run and
+        # the worker daemon on a timer, never per job
+        hits = job_metrics.counter_value("cache_lookups_total", result="hit")
+        misses = job_metrics.counter_value("cache_lookups_total", result="miss")
+        print(f"🗄️ Cache: {hits} hits, {misses} misses ({hits / max(1, hits + misses):.0%}), "
+              f"{job_metrics.counter_value('cache_writes_total')} writes")
+    # Wall time summed over concurrent slots, so stages can add up to more than the run
+    stage_times = sorted(
+        ((dict(labels)["stage"], histogram.sum) for (name, labels), histogram in job_metrics.histograms.items()
+         if name == "stage_seconds"),
+        key=lambda item: -item[1]
+    )
+    print("⏱️ Stage time: " + ", ".join(f"{stage} {seconds:.1f}s" for stage, seconds in stage_times))
+    if HEDGE_POLICY is not None:
+        hedges = job_metrics.counter_value("hedges_total", outcome="sent")
+        requests = job_metrics.counter_value("hedge_requests_total")
+        wins = job_metrics.counter_value("hedges_total", outcome="won")
+        print(f"🪁 Hedged {hedges} of {requests} requests; {wins} duplicates answered first")
+    if METRICS_PATH:
+        export_metrics()
+        print(f"📈 Metrics written to {METRICS_PATH}")
+    return totals
+
+def run_parallel_requests(job):
+    if not API_KEYS:
+        raise SystemExit("❌ No API keys found. Set MISTRAL_API_KEY (and MISTRAL_API_KEY2, ...) or MISTRAL_API_KEYS.")
+    totals = asyncio.run(run_job(job))
+    if RESPONSE_CACHE:
+        RESPONSE_CACHE.evict()
+        print(f"🗄️ Cache eviction: {RESPONSE_CACHE.evictions} entries removed")
+    return totals
 
 # === Entrypoint ===
 if __name__ == "__main__":
-    run_parallel_requests()
+    args = parser.parse_args()
+    try:
+        job = ExtractionJob.from_args(args).validate().derive_defaults()
+    except ValueError as e:
+        parser.error(str(e))
+    configure(args)
+    run_parallel_requests(job)
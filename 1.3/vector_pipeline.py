@@ -0,0 +1,401 @@
+import os
+import re
+import json
+import zlib
+import numpy as np
+
+from ann_index import IVFPQIndex
+from lexical_index import BM25Index
+from page_splitter import PageIndex
+
+# === Local Embeddings ===
+_TOKENS = re.compile(r"[a-z0-9]+")
+
+
+class HashedNgramEmbedder:
+    # Offline embedding: word unigrams plus character n-grams of each word, hashed into
+    # `dim` signed buckets and L2-normalized. Deterministic across runs and machines
+    # (crc32, not Python's salted hash), so stored vectors stay comparable.
+
+    name = "hashed_ngram"
+
+    def __init__(self, dim=512, ngram_range=(3, 5), word_weight=2.0):
+        self.dim = dim
+        self.ngram_range = tuple(ngram_range)
+        self.word_weight = word_weight
+
+    def config(self):
+        return {"dim": self.dim, "ngram_range": list(self.ngram_range), "word_weight": self.word_weight}
+
+    def _features(self, text):
+        low, high = self.ngram_range
+        for word in _TOKENS.findall(text.lower()):
+            yield word, self.word_weight
+            padded = f"<{word}>"
+            for n in range(low, high + 1):
+                for i in range(len(padded) - n + 1):
+                    yield padded[i:i + n], 1.0
+
+    def __call__(self, texts):
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                matrix[row, h % self.dim] += weight if (h >> 31) & 1 else -weight
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+
+EMBEDDERS = {HashedNgramEmbedder.name: HashedNgramEmbedder}
+
+
+# === Insertion Records ===
+def load_insertions(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def record_text(record):
+    return record.get("text") or record.get("metadata", {}).get("content", "")
+
+
+# === Exact Index ===
+class VectorIndex:
+    # On-disk layout (one directory):
+    #   index.json       dimension, row count, embedder config, client/section vocabularies
+    #   embeddings.f32   row-major float32 matrix, opened with np.memmap
+    #   metadata.jsonl   one insertion record per row (the sidecar table)
+    #   columns.npz      per-row client/section codes, live flags and sidecar byte offsets
+    #   ann/             optional IVF-PQ index over the same row ids (see ann_index.py)
+    #   bm25/            BM25 inverted index over the same row ids (see lexical_index.py)
+    # Queries only touch the matrix and the code columns; metadata rows are read by
+    # offset for the hits. Rows are append-only: re-extracted clients are removed
+    # (flagged dead) and appended again.
+
+    selective_rows = 4  # filters under this many rows per cell and hit skip the ANN index
+
+    def __init__(self, index_dir, embed_fn=None):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, "index.json"), "r", encoding="utf-8") as f:
+            self.info = json.load(f)
+        self.embed_fn = embed_fn or EMBEDDERS[self.info["embedder"]](**self.info["embedder_config"])
+        self.dim = self.info["dim"]
+        self.clients = {name: code for code, name in enumerate(self.info["clients"])}
+        self.sections = {name: code for code, name in enumerate(self.info["sections"])}
+
+        columns = np.load(os.path.join(index_dir, "columns.npz"))
+        self.client_codes = columns["client_codes"]
+        self.section_codes = columns["section_codes"]
+        self.alive = columns["alive"]
+        self.offsets = columns["offsets"]
+        self._open_matrix()
+        self._metadata = open(os.path.join(index_dir, "metadata.jsonl"), "rb")
+
+        ann_dir = os.path.join(index_dir, "ann")
+        self.ann = IVFPQIndex.load(ann_dir) if os.path.exists(os.path.join(ann_dir, "config.json")) else None
+        bm25_dir = os.path.join(index_dir, "bm25")
+        self.bm25 = BM25Index(bm25_dir) if os.path.isdir(bm25_dir) else None
+
+    @property
+    def count(self):
+        return len(self.client_codes)
+
+    def _open_matrix(self):
+        self.matrix = (
+            np.memmap(os.path.join(self.index_dir, "embeddings.f32"), dtype=np.float32, mode="r",
+                      shape=(self.count, self.dim))
+            if self.count else np.zeros((0, self.dim), dtype=np.float32)
+        )
+
+    def _save_columns(self):
+        tmp_path = os.path.join(self.index_dir, "columns.tmp.npz")
+        np.savez(tmp_path, client_codes=self.client_codes, section_codes=self.section_codes,
+                 alive=self.alive, offsets=self.offsets)
+        os.replace(tmp_path, os.path.join(self.index_dir, "columns.npz"))
+        self.info.update(count=self.count, clients=list(self.clients), sections=list(self.sections))
+        with open(os.path.join(self.index_dir, "index.json"), "w", encoding="utf-8") as f:
+            json.dump(self.info, f, indent=2)
+
+    # === Build ===
+    @classmethod
+    def build(cls, records, index_dir, embed_fn=None, batch_size=1024):
+        # Creates an empty index and appends every record
+        embed_fn = embed_fn or HashedNgramEmbedder()
+        os.makedirs(index_dir, exist_ok=True)
+        open(os.path.join(index_dir, "embeddings.f32"), "wb").close()
+        open(os.path.join(index_dir, "metadata.jsonl"), "wb").close()
+        empty = np.zeros(0, dtype=np.int32)
+        np.savez(os.path.join(index_dir, "columns.npz"), client_codes=empty, section_codes=empty,
+                 alive=np.zeros(0, dtype=bool), offsets=np.zeros(1, dtype=np.int64))
+        with open(os.path.join(index_dir, "index.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "dim": embed_fn.dim,
+                "count": 0,
+                "embedder": getattr(embed_fn, "name", None),
+                "embedder_config": embed_fn.config() if hasattr(embed_fn, "config") else {},
+                "clients": [],
+                "sections": [],
+            }, f, indent=2)
+        os.makedirs(os.path.join(index_dir, "bm25"), exist_ok=True)
+        index = cls(index_dir, embed_fn)
+        index.append(records, batch_size)
+        return index
+
+    def append(self, records, batch_size=1024):
+        # Embeds records in batches onto the end of the matrix file; returns their row ids
+        records = list(records)
+        first = self.count
+        client_codes = np.empty(len(records), dtype=np.int32)
+        section_codes = np.empty(len(records), dtype=np.int32)
+        offsets = np.empty(len(records), dtype=np.int64)
+
+        with open(os.path.join(self.index_dir, "embeddings.f32"), "ab") as matrix_file, \
+                open(os.path.join(self.index_dir, "metadata.jsonl"), "ab") as metadata_file:
+            for start in range(0, len(records), batch_size):
+                batch = records[start:start + batch_size]
+                vectors = np.asarray(self.embed_fn([record_text(r) for r in batch]), dtype=np.float32)
+                matrix_file.write(vectors.tobytes())
+                if self.ann is not None:
+                    self.ann.add(np.arange(first + start, first + start + len(batch)), vectors)
+            for row, record in enumerate(records):
+                metadata = record.get("metadata", {})
+                client_codes[row] = self.clients.setdefault(metadata.get("client_id", ""), len(self.clients))
+                section_codes[row] = self.sections.setdefault(metadata.get("section", ""), len(self.sections))
+                metadata_file.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+                offsets[row] = metadata_file.tell()
+
+        self.client_codes = np.concatenate([self.client_codes, client_codes])
+        self.section_codes = np.concatenate([self.section_codes, section_codes])
+        self.alive = np.concatenate([self.alive, np.ones(len(records), dtype=bool)])
+        self.offsets = np.concatenate([self.offsets, offsets])
+        self._save_columns()
+        self._open_matrix()
+        if self.ann is not None:
+            self.ann.save(os.path.join(self.index_dir, "ann"))
+        if self.bm25 is not None and records:
+            self.bm25.append(np.arange(first, self.count), records)
+        return np.arange(first, self.count)
+
+    def remove_client(self, client_id):
+        # Flags every row of a client dead (e.g. before appending its re-extracted records)
+        code = self.clients.get(client_id)
+        if code is None:
+            return 0
+        rows = np.flatnonzero((self.client_codes == code) & self.alive)
+        self.alive[rows] = False
+        self._save_columns()
+        if self.ann is not None:
+            self.ann.remove(rows)
+            self.ann.save(os.path.join(self.index_dir, "ann"))
+        if self.bm25 is not None:
+            self.bm25.remove(rows)
+        return len(rows)
+
+    def replace_client(self, client_id, records):
+        self.remove_client(client_id)
+        return self.append(records)
+
+    # === Approximate Search ===
+    def build_ann(self, nlist=None, m=16, nprobe=8, rerank=4):
+        # Trains an IVF-PQ index over the live rows; nlist defaults to ~4*sqrt(rows)
+        rows = np.flatnonzero(self.alive)
+        nlist = nlist or max(1, int(4 * np.sqrt(len(rows))))
+        self.ann = IVFPQIndex(self.dim, nlist=nlist, m=m, nprobe=nprobe, rerank=rerank)
+        self.ann.train(self.matrix[rows])
+        for start in range(0, len(rows), 65536):
+            batch = rows[start:start + 65536]
+            self.ann.add(batch, self.matrix[batch])
+        self.ann.save(os.path.join(self.index_dir, "ann"))
+        return self.ann
+
+    # === Lookup ===
+    def record(self, row):
+        start, end = self.offsets[row], self.offsets[row + 1]
+        self._metadata.seek(int(start))
+        return json.loads(self._metadata.read(int(end - start)))
+
+    def filter_mask(self, client_id=None, section=None):
+        mask = self.alive.copy()
+        if client_id is not None:
+            mask &= self.client_codes == self.clients.get(client_id, -1)
+        if section is not None:
+            mask &= self.section_codes == self.sections.get(section, -1)
+        return mask
+
+    def filter_rows(self, client_id=None, section=None):
+        # Row numbers passing the filters, or None for "all rows"
+        if client_id is None and section is None and self.alive.all():
+            return None
+        return np.flatnonzero(self.filter_mask(client_id, section))
+
+    def search_vectors(self, queries, k=5, rows=None):
+        # queries: (b, dim) normalized float32. Returns (row ids, scores), each (b, <=k).
+        # Scores are one matrix product over the candidate rows; top-k via argpartition.
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        candidates = self.matrix if rows is None else self.matrix[rows]
+        if len(candidates) == 0:
+            empty = np.zeros((len(queries), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+        scores = queries @ candidates.T
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        ids = top if rows is None else rows[top]
+        return ids, top_scores
+
+    def _hits(self, row_ids, row_scores):
+        return [dict(self.record(row), score=float(score)) for row, score in zip(row_ids, row_scores) if row >= 0]
+
+    def _ann_search(self, vectors, k, mask=None, nprobe=None, rerank=None):
+        # IVF only scores rows in the probed cells, so a narrow filter can leave fewer than
+        # k allowed rows there. Filters passing under selective_rows * nlist * k rows are
+        # searched exactly, and any query the ANN still returns short is redone exactly.
+        rows = None if mask is None else np.flatnonzero(mask)
+        if rows is not None and len(rows) < self.selective_rows * self.ann.nlist * k:
+            return self.search_vectors(vectors, k, rows)
+        ids, scores = self.ann.search(vectors, k, nprobe, rerank, allowed=mask, vectors=self.matrix)
+        available = int(self.alive.sum()) if rows is None else len(rows)
+        short = (ids >= 0).sum(axis=1) < min(k, available)
+        if short.any():
+            exact_ids, exact_scores = self.search_vectors(vectors[short], k, self.filter_rows() if rows is None else rows)
+            width = exact_ids.shape[1]
+            ids[short], scores[short] = -1, -np.inf
+            ids[short, :width], scores[short, :width] = exact_ids, exact_scores
+        return ids, scores
+
+    def search(self, queries, k=5, client_id=None, section=None, exact=None, nprobe=None, rerank=None):
+        # Batched text search; returns one hit list per query, best first, each hit the
+        # insertion record plus its cosine score. Uses the ANN index when one is built,
+        # unless exact=True.
+        single = isinstance(queries, str)
+        queries = [queries] if single else list(queries)
+        vectors = self.embed_fn(queries)
+        if self.ann is not None and not exact:
+            mask = None
+            if client_id is not None or section is not None:
+                mask = self.filter_mask(client_id, section)
+            ids, scores = self._ann_search(vectors, k, mask, nprobe, rerank)
+        else:
+            ids, scores = self.search_vectors(vectors, k, self.filter_rows(client_id, section))
+        results = [self._hits(row_ids, row_scores) for row_ids, row_scores in zip(ids, scores)]
+        return results[0] if single else results
+
+    def search_lexical(self, query, k=5, client_id=None, section=None):
+        rows, scores = self.bm25.search(query, k, self.filter_mask(client_id, section))
+        return self._hits(rows, scores)
+
+    def search_hybrid(self, query, k=5, client_id=None, section=None, alpha=0.5, candidates=50):
+        # Fuses BM25 and cosine scores: alpha * cosine + (1 - alpha) * BM25 / best BM25.
+        # Candidates are the union of both top lists; each side's score is then filled
+        # in exactly for the other side's candidates, so exact lookups ("G35", a case
+        # number) and paraphrases both rank.
+        mask = self.filter_mask(client_id, section)
+        lexical_rows, lexical_scores = self.bm25.score(query, mask)
+        vector = self.embed_fn([query])
+        if self.ann is not None:
+            vector_rows, _ = self._ann_search(vector, candidates, mask)
+        else:
+            vector_rows, _ = self.search_vectors(vector, candidates, np.flatnonzero(mask))
+        vector_rows = vector_rows[0][vector_rows[0] >= 0]
+
+        if len(lexical_rows) > candidates:
+            top = np.argpartition(-lexical_scores, candidates - 1)[:candidates]
+        else:
+            top = np.arange(len(lexical_rows))
+        rows = np.union1d(lexical_rows[top], vector_rows).astype(np.int64)
+        if not len(rows):
+            return []
+
+        cosine = np.clip(np.asarray(self.matrix[rows]) @ vector[0], 0, None)
+        lexical = np.zeros(len(rows), dtype=np.float32)
+        if len(lexical_rows):
+            position = np.searchsorted(lexical_rows, rows)
+            found = (position < len(lexical_rows)) & (lexical_rows[np.minimum(position, len(lexical_rows) - 1)] == rows)
+            lexical[found] = lexical_scores[position[found]] / lexical_scores.max()
+        fused = alpha * cosine + (1 - alpha) * lexical
+        order = np.argsort(-fused)[:k]
+        return self._hits(rows[order], fused[order])
+
+    def close(self):
+        self._metadata.close()
+
+
+# === CLI ===
+if __name__ == "__main__":
+    import time
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build or query the local vector index over insertion records")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_cmd = sub.add_parser("build")
+    build_cmd.add_argument("--insertions", required=True, help="all_insertions.json (or any list of insertion records)")
+    build_cmd.add_argument("--index_dir", required=True)
+    build_cmd.add_argument("--dim", type=int, default=512)
+    update_cmd = sub.add_parser("update", help="Replace one client's records (e.g. after re-extraction)")
+    update_cmd.add_argument("--insertions", required=True)
+    update_cmd.add_argument("--index_dir", required=True)
+    update_cmd.add_argument("--client_id", required=True)
+    ann_cmd = sub.add_parser("ann", help="Train the approximate (IVF-PQ) index over the current rows")
+    ann_cmd.add_argument("--index_dir", required=True)
+    ann_cmd.add_argument("--nlist", type=int, default=None, help="Coarse cells (default ~4*sqrt(rows))")
+    ann_cmd.add_argument("--m", type=int, default=16, help="PQ sub-vectors (bytes per stored vector)")
+    ann_cmd.add_argument("--nprobe", type=int, default=8, help="Default cells scanned per query")
+    ann_cmd.add_argument("--rerank", type=int, default=4, help="Default exact re-scoring of rerank*k candidates")
+    query_cmd = sub.add_parser("query")
+    query_cmd.add_argument("--index_dir", required=True)
+    query_cmd.add_argument("--client_id", default=None)
+    query_cmd.add_argument("--section", default=None)
+    query_cmd.add_argument("-k", type=int, default=5)
+    query_cmd.add_argument("--exact", action="store_true", help="Brute-force search even if an ANN index exists")
+    query_cmd.add_argument("--nprobe", type=int, default=None)
+    query_cmd.add_argument("--rerank", type=int, default=None)
+    query_cmd.add_argument("--mode", choices=["vector", "lexical", "hybrid"], default="vector")
+    query_cmd.add_argument("--alpha", type=float, default=0.5, help="Hybrid weight of the vector score")
+    query_cmd.add_argument("--source_text", nargs="*", default=[],
+                           help="Extracted text files (with their .pages.json index) to show cited passages from")
+    query_cmd.add_argument("--page_index_dir", default=None,
+                           help="Directory holding the .pages.json indexes, if not beside the text files")
+    query_cmd.add_argument("text", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        index = VectorIndex.build(load_insertions(args.insertions), args.index_dir, HashedNgramEmbedder(args.dim))
+        print(f"✅ Indexed {index.count} records in {time.perf_counter() - start:.2f}s → {args.index_dir}")
+    elif args.command == "update":
+        index = VectorIndex(args.index_dir)
+        records = [r for r in load_insertions(args.insertions) if r.get("metadata", {}).get("client_id") == args.client_id]
+        removed = index.remove_client(args.client_id)
+        index.append(records)
+        print(f"✅ {args.client_id}: replaced {removed} rows with {len(records)}")
+    elif args.command == "ann":
+        index = VectorIndex(args.index_dir)
+        start = time.perf_counter()
+        ann = index.build_ann(args.nlist, args.m, args.nprobe, args.rerank)
+        print(f"✅ IVF-PQ over {len(ann)} rows ({ann.nlist} cells, {ann.m} bytes/vector) "
+              f"in {time.perf_counter() - start:.2f}s")
+    else:
+        index = VectorIndex(args.index_dir)
+        sources = [PageIndex.load(path, args.page_index_dir) for path in args.source_text]
+        start = time.perf_counter()
+        if args.mode == "vector":
+            results = index.search(args.text, args.k, args.client_id, args.section, args.exact, args.nprobe, args.rerank)
+        elif args.mode == "lexical":
+            results = [index.search_lexical(text, args.k, args.client_id, args.section) for text in args.text]
+        else:
+            results = [index.search_hybrid(text, args.k, args.client_id, args.section, args.alpha) for text in args.text]
+        elapsed = (time.perf_counter() - start) * 1000
+        for text, hits in zip(args.text, results):
+            print(f"🔎 {text}")
+            for hit in hits:
+                meta = hit["metadata"]
+                print(f"  {hit['score']:.3f}  [{meta['section']}] {meta['content'][:100]} "
+                      f"(pages {meta['citation']['pages']}, {meta['citation']['file']})")
+                for page_index in sources:
+                    for page, passage in page_index.cited_text(meta["citation"]):
+                        print(f"      p.{page}: {' '.join(passage.split())[:200]}")
+        print(f"⏱️ {len(args.text)} queries in {elapsed:.1f} ms")
@@ -0,0 +1,334 @@
+import os
+import json
+import time
+import signal
+import asyncio
+import sqlite3
+import argparse
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import summarize_data
+from summarize_data import ExtractionJob, add_shared_arguments, configure, build_key_slots, run_job, METRICS
+
+
+# === Job Store ===
+class JobStore:
+    # SQLite-backed job queue. The HTTP threads and the scheduler each use their own
+    # connection; WAL lets status polls read while a job's progress is being written.
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            status TEXT NOT NULL,  -- queued, running, cancelling, done, failed, cancelled
+            spec TEXT NOT NULL,
+            pages_read INTEGER NOT NULL DEFAULT 0,
+            pages_done INTEGER NOT NULL DEFAULT 0,
+            result TEXT,
+            error TEXT,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL
+        );
+        CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._conn().executescript(self.SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row(row):
+        if row is None:
+            return None
+        job = dict(row)
+        job["spec"] = json.loads(job["spec"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def submit(self, spec):
+        cursor = self._conn().execute(
+            "INSERT INTO jobs (status, spec, created_at) VALUES ('queued', ?, ?)",
+            (json.dumps(spec), time.time())
+        )
+        return cursor.lastrowid
+
+    def get(self, job_id):
+        return self._row(self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def list(self, status=None, limit=100):
+        if status:
+            rows = self._conn().execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY id DESC LIMIT ?", (status, limit))
+        else:
+            rows = self._conn().execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,))
+        return [self._row(row) for row in rows]
+
+    def counts(self):
+        return dict(self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def claim_next(self):
+        # Oldest queued job -> running, atomically
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+            if row is not None:
+                conn.execute("UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?", (time.time(), row["id"]))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return self._row(row)
+
+    def update_progress(self, job_id, pages_read, pages_done):
+        self._conn().execute(
+            "UPDATE jobs SET pages_read = ?, pages_done = ? WHERE id = ?", (pages_read, pages_done, job_id))
+
+    def finish(self, job_id, status, result=None, error=None):
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+            (status, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+        )
+
+    def cancel(self, job_id):
+        # Queued jobs are cancelled here; running ones are flagged for the scheduler to stop
+        conn = self._conn()
+        conn.execute("UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'",
+                     (time.time(), job_id))
+        conn.execute("UPDATE jobs SET status = 'cancelling' WHERE id = ? AND status = 'running'", (job_id,))
+        return self.get(job_id)
+
+    def cancelling(self):
+        return [row[0] for row in self._conn().execute("SELECT id FROM jobs WHERE status = 'cancelling'")]
+
+    def requeue(self, job_id):
+        # Back to the queue as a resumed run: pages already in its live log are not sent again
+        job = self.get(job_id)
+        spec = dict(job["spec"], resume=True)
+        self._conn().execute(
+            "UPDATE jobs SET status = 'queued', spec = ?, started_at = NULL WHERE id = ?", (json.dumps(spec), job_id))
+
+    def requeue_interrupted(self):
+        ids = [row[0] for row in self._conn().execute("SELECT id FROM jobs WHERE status IN ('running', 'cancelling')")]
+        for job_id in ids:
+            self.requeue(job_id)
+        return ids
+
+
+# === Scheduler ===
+class WorkerDaemon:
+    # Runs queued jobs concurrently on one event loop. Every job shares the same key slots,
+    # so Mistral clients and their connection pools stay warm between jobs, and the
+    # per-key rate limits and concurrency caps hold across all of them.
+
+    def __init__(self, store, data_root, max_jobs=4, poll_interval=0.5, cache_evict_every=600):
+        self.store = store
+        self.data_root = data_root
+        self.cache_evict_every = cache_evict_every
+        self.max_jobs = max(1, max_jobs)
+        self.poll_interval = poll_interval
+        self.key_slots = None
+        self.running = {}  # job id -> (task, ExtractionJob)
+        self.stopping = False
+
+    async def _run_one(self, job_id, job):
+        try:
+            totals = await run_job(job, self.key_slots)
+        except asyncio.CancelledError:
+            if self.stopping:
+                self.store.requeue(job_id)
+            else:
+                self.store.update_progress(job_id, job.pages_read, job.pages_done)
+                self.store.finish(job_id, "cancelled")
+        except Exception as e:
+            print(f"❌ Job {job_id} failed: {e}")
+            self.store.update_progress(job_id, job.pages_read, job.pages_done)
+            self.store.finish(job_id, "failed", error=f"{type(e).__name__}: {e}")
+        else:
+            self.store.update_progress(job_id, job.pages_read, job.pages_done)
+            self.store.finish(job_id, "done", result=totals)
+            print(f"✅ Job {job_id} done: {totals['pages']} pages")
+        finally:
+            self.running.pop(job_id, None)
+
+    def _start_jobs(self):
+        while len(self.running) < self.max_jobs:
+            row = self.store.claim_next()
+            if row is None:
+                return
+            try:
+                job = ExtractionJob.from_dict(row["spec"]).validate().confine(self.data_root)
+            except (TypeError, ValueError) as e:
+                self.store.finish(row["id"], "failed", error=str(e))
+                continue
+            print(f"🚚 Job {row['id']} started")
+            task = asyncio.create_task(self._run_one(row["id"], job))
+            self.running[row["id"]] = (task, job)
+
+    async def _evict_cache_periodically(self):
+        # The response cache is shared by every job; trimming it walks the whole directory,
+        # so it runs on a thread on its own schedule rather than after each job
+        cache = summarize_data.RESPONSE_CACHE
+        while True:
+            await asyncio.sleep(self.cache_evict_every)
+            before = cache.evictions
+            await asyncio.to_thread(cache.evict)
+            if cache.evictions > before:
+                print(f"🗄️ Cache eviction: {cache.evictions - before} entries removed")
+
+    async def run(self, stop_event):
+        self.key_slots = build_key_slots()
+        evictor = None
+        if summarize_data.RESPONSE_CACHE is not None:
+            evictor = asyncio.create_task(self._evict_cache_periodically())
+        for key_slot in self.key_slots:
+            key_slot.slots = asyncio.Semaphore(summarize_data.CONCURRENCY_PER_KEY)
+        requeued = self.store.requeue_interrupted()
+        if requeued:
+            print(f"♻️ Resuming {len(requeued)} jobs interrupted by the last shutdown: {requeued}")
+
+        while not stop_event.is_set():
+            for job_id in self.store.cancelling():
+                if job_id in self.running:
+                    self.running[job_id][0].cancel()
+                else:
+                    self.store.finish(job_id, "cancelled")
+            self._start_jobs()
+            for job_id, (_, job) in list(self.running.items()):
+                self.store.update_progress(job_id, job.pages_read, job.pages_done)
+            try:
+                await asyncio.wait_for(stop_event.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+        # Shutdown: running jobs go back to the queue and resume on the next start
+        self.stopping = True
+        if evictor is not None:
+            evictor.cancel()
+        tasks = [task for task, _ in self.running.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# === HTTP API ===
+def make_handler(store, key_count, data_root):
+    # Job specs name files by path; every path must resolve inside data_root
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, payload, content_type="application/json"):
+            body = payload.encode("utf-8") if isinstance(payload, str) else json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _job_id(self, path):
+            parts = path.strip("/").split("/")
+            if len(parts) == 2 and parts[0] == "jobs" and parts[1].isdigit():
+                return int(parts[1])
+            return None
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/health":
+                return self._send(200, {"status": "ok", "keys": key_count, "jobs": store.counts()})
+            if url.path == "/metrics":
+                return self._send(200, METRICS.to_prometheus(), "text/plain; version=0.0.4")
+            if url.path.rstrip("/") == "/jobs":
+                query = parse_qs(url.query)
+                status = query.get("status", [None])[0]
+                try:
+                    limit = int(query.get("limit", ["100"])[0])
+                except ValueError:
+                    limit = 0
+                if limit < 1:
+                    return self._send(400, {"message": "limit must be a positive integer"})
+                return self._send(200, {"jobs": store.list(status, limit)})
+            job_id = self._job_id(url.path)
+            job = store.get(job_id) if job_id is not None else None
+            if job is None:
+                return self._send(404, {"message": "Job not found"})
+            return self._send(200, job)
+
+        def do_POST(self):
+            if urlparse(self.path).path.rstrip("/") != "/jobs":
+                return self._send(404, {"message": "Not found"})
+            try:
+                spec = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                job = ExtractionJob.from_dict(spec).validate().confine(data_root)
+            except (ValueError, TypeError) as e:
+                return self._send(400, {"message": f"Invalid job: {e}"})
+            job_id = store.submit(job.to_dict())
+            return self._send(201, store.get(job_id))
+
+        def do_DELETE(self):
+            job_id = self._job_id(urlparse(self.path).path)
+            if job_id is None or store.get(job_id) is None:
+                return self._send(404, {"message": "Job not found"})
+            job = store.cancel(job_id)
+            if job["status"] in ("done", "failed"):
+                return self._send(409, {"message": f"Job already {job['status']}", "job": job})
+            return self._send(202, job)
+
+    return Handler
+
+
+# === Entrypoint ===
+async def serve(args):
+    store = JobStore(args.db)
+    data_root = os.path.realpath(args.data_root)
+    httpd = ThreadingHTTPServer((args.host, args.port), make_handler(store, len(summarize_data.API_KEYS), data_root))
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    print(f"🛰️ Extraction worker on http://{args.host}:{args.port} "
+          f"({len(summarize_data.API_KEYS)} keys, up to {args.max_jobs} jobs, queue in {args.db}, files under {data_root})")
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass  # Windows: Ctrl+C still raises KeyboardInterrupt
+    try:
+        await WorkerDaemon(store, data_root, args.max_jobs, args.poll_interval, args.cache_evict_every).run(stop_event)
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+        print("👋 Worker stopped; unfinished jobs will resume on the next start")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Long-running extraction worker with a SQLite job queue and a local HTTP API")
+    parser.add_argument("--db", default="worker_jobs.db", help="SQLite job queue")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--max_jobs", type=int, default=4, help="Jobs run concurrently (they share the keys)")
+    parser.add_argument("--poll_interval", type=float, default=0.5, help="Seconds between queue checks")
+    parser.add_argument("--cache_evict_every", type=float, default=600,
+                        help="Seconds between response cache evictions (with --cache_dir)")
+    parser.add_argument("--data_root", default=".",
+                        help="Job inputs and outputs must lie under this directory; relative job paths are "
+                             "taken from it (default: the working directory)")
+    add_shared_arguments(parser)
+    args = parser.parse_args()
+    configure(args)
+    if not summarize_data.API_KEYS:
+        raise SystemExit("❌ No API keys found. Set MISTRAL_API_KEY (and MISTRAL_API_KEY2, ...) or MISTRAL_API_KEYS.")
+    asyncio.run(serve(args))
@@ -0,0 +1,90 @@
+const express = require('express');
+const router = express.Router();
+const path = require('path');
+const fs = require('fs');
+const crypto = require('crypto');
+const worker = require('../services/extractionWorker');
+
+// Jobs only read uploaded files and only write under JOBS_DIR; the worker is started
+// with --data_root APP_ROOT, so it rejects any other path as well.
+const APP_ROOT = path.join(__dirname, '../..');
+const UPLOADS_DIR = path.join(APP_ROOT, 'uploads');
+const JOBS_DIR = path.join(APP_ROOT, 'extraction_jobs');
+const INPUT_TYPES = ['.pdf', '.txt'];
+
+const requestError = (status, message) => Object.assign(new Error(message), { status });
+
+// Worker job spec for { files: [upload names, as /api/files lists them] }. The uploads go
+// into a manifest; results land in a fresh job directory.
+const buildJobSpec = (body) => {
+  const files = body && body.files;
+  if (!Array.isArray(files) || files.length === 0) {
+    throw requestError(400, 'files must list one or more uploaded files');
+  }
+  for (const name of files) {
+    if (typeof name !== 'string' || path.basename(name) !== name || name.startsWith('.')
+        || !INPUT_TYPES.includes(path.extname(name).toLowerCase())) {
+      throw requestError(400, `Not an uploaded PDF or text file: ${name}`);
+    }
+    if (!fs.existsSync(path.join(UPLOADS_DIR, name))) {
+      throw requestError(404, `Upload not found: ${name}`);
+    }
+  }
+
+  const jobDir = path.join(JOBS_DIR, `${Date.now()}-${crypto.randomBytes(4).toString('hex')}`);
+  fs.mkdirSync(jobDir, { recursive: true });
+  const manifest = path.join(jobDir, 'inputs.txt');
+  fs.writeFileSync(manifest, files.map(name => path.join(UPLOADS_DIR, name)).join('\n') + '\n');
+  return {
+    batch: manifest,
+    output_dir: path.join(jobDir, 'results'),
+    live_output: path.join(jobDir, 'live.jsonl')
+  };
+};
+
+const sendError = (res, error, message) => {
+  console.error(`${message}:`, error);
+  res.status(error.status || 502).json({
+    message,
+    error: error.message
+  });
+};
+
+// Submit an extraction job over uploaded files: { files: ["report.pdf", ...] }
+router.post('/', async (req, res) => {
+  try {
+    const job = await worker.submitJob(buildJobSpec(req.body));
+    res.status(201).json(job);
+  } catch (error) {
+    sendError(res, error, 'Failed to submit extraction job');
+  }
+});
+
+// List jobs, optionally filtered by ?status=queued|running|done|failed|cancelled
+router.get('/', async (req, res) => {
+  try {
+    res.status(200).json(await worker.listJobs(req.query.status));
+  } catch (error) {
+    sendError(res, error, 'Failed to list extraction jobs');
+  }
+});
+
+// Job status and progress (pages_read / pages_done), for polling
+router.get('/:id', async (req, res) => {
+  try {
+    res.status(200).json(await worker.getJob(req.params.id));
+  } catch (error) {
+    sendError(res, error, 'Failed to get extraction job');
+  }
+});
+
+// Cancel a queued or running job
+router.delete('/:id', async (req, res) => {
+  try {
+    res.status(202).json(await worker.cancelJob(req.params.id));
+  } catch (error) {
+    sendError(res, error, 'Failed to cancel extraction job');
+  }
+});
+
+module.exports = router;
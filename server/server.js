@@ -32,6 +32,7 @@ app.use(fileUpload({
 // API Routes
 app.use('/api/files', require('./routes/files'));
 app.use('/api/chat', require('./routes/chat'));
+app.use('/api/jobs', require('./routes/jobs'));
 
 // Serve static files from the React app in production
 if (process.env.NODE_ENV === 'production') {
@@ -0,0 +1,44 @@
+// Client for the Python extraction worker (1.3/worker_daemon.py).
+// The worker keeps its Mistral clients warm and queues jobs in SQLite, so an upload
+// submits a job here instead of starting a new summarize_data.py process.
+
+const WORKER_URL = process.env.EXTRACTION_WORKER_URL || 'http://127.0.0.1:8787';
+
+const request = async (method, path, body) => {
+  const response = await fetch(`${WORKER_URL}${path}`, {
+    method,
+    headers: body ? { 'Content-Type': 'application/json' } : undefined,
+    body: body ? JSON.stringify(body) : undefined
+  });
+  const data = await response.json();
+  if (!response.ok) {
+    const error = new Error(data.message || `Extraction worker returned ${response.status}`);
+    error.status = response.status;
+    throw error;
+  }
+  return data;
+};
+
+// spec: { input_text | batch, output_json + output_stats | output_dir, live_output,
+//         consolidate_dir, client_id, dedupe_index, resume } (paths under the worker's --data_root)
+const submitJob = (spec) => request('POST', '/jobs', spec);
+
+const getJob = (id) => request('GET', `/jobs/${id}`);
+
+const listJobs = (status) => request('GET', status ? `/jobs?status=${encodeURIComponent(status)}` : '/jobs');
+
+const cancelJob = (id) => request('DELETE', `/jobs/${id}`);
+
+const health = () => request('GET', '/health');
+
+// Polls until the job finishes; onProgress receives every status update
+const waitForJob = async (id, { intervalMs = 2000, onProgress } = {}) => {
+  for (;;) {
+    const job = await getJob(id);
+    if (onProgress) onProgress(job);
+    if (['done', 'failed', 'cancelled'].includes(job.status)) return job;
+    await new Promise(resolve => setTimeout(resolve, intervalMs));
+  }
+};
+
+module.exports = { submitJob, getJob, listJobs, cancelJob, health, waitForJob };